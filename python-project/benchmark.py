@@ -0,0 +1,435 @@
+import argparse
+import json
+import platform
+import random
+import statistics
+import subprocess
+import tracemalloc
+import time
+import sys
+import os
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+import biydaalt2 as bd
+
+
+MN_SYLLABLES = ["мон", "гол", "хэл", "бич", "иг", "үс", "эг", "ард", "улс", "ын", "ний",
+                "тай", "сан", "даг", "ч", "өр", "гүй", "лэх", "жиг", "дэл", "хүн", "ам"]
+EN_SYLLABLES = ["pro", "gram", "ming", "hy", "phen", "a", "tion", "in", "com", "pa",
+                "ra", "ble", "the", "and", "text", "line", "con", "ver", "sion", "im"]
+
+
+def make_corpus(n_words, lang="mn", seed=42):
+    rnd = random.Random(seed)
+    syllables = MN_SYLLABLES if lang == "mn" else EN_SYLLABLES
+    return ["".join(rnd.choice(syllables) for _ in range(rnd.randint(1, 4))) for _ in range(n_words)]
+
+
+def timed(fn, *args):
+    t0 = time.perf_counter()
+    result = fn(*args)
+    return result, (time.perf_counter() - t0) * 1000
+
+
+def bench_dp_scaling(sizes, widths, lang="mn"):
+    print(f"{'words':>9} {'width':>6} {'dp_break':>14} {'fast_dp_break':>14} {'speedup':>8}")
+    for n in sizes:
+        words = make_corpus(n, lang)
+        for width in widths:
+            slow, slow_ms = timed(bd.dp_break, words, width)
+            fast, fast_ms = timed(bd.fast_dp_break, words, width)
+            assert slow == fast, "fast_dp_break-ийн үр дүн dp_break-аас зөрлөө"
+            print(f"{n:>9} {width:>6} {bd.format_ms(slow_ms):>14} {bd.format_ms(fast_ms):>14} "
+                  f"{slow_ms / fast_ms:>7.1f}x")
+
+
+def bench_hyphenation(paths=("test.txt", "test2.txt"), n_synthetic=20_000):
+    # Кэшгүйгээр, давтагдахгүй үгсийн жагсаалт дээр хэмжинэ
+    for lang, dic_path in (("mn", "hyph_mn_MN.dic"), ("en", "hyph_en_US.dic")):
+        vocab = set(make_corpus(n_synthetic, lang))
+        for path in paths:
+            with open(path, "r", encoding="utf-8") as f:
+                vocab.update(bd.split_words(f.read()))
+        vocab = sorted(vocab)
+
+        slow, fast = bd.PyphenHyphenator(dic_path), bd.LiangHyphenator(dic_path)
+        slow.dic.hd.cache.clear()
+        slow_cuts, slow_ms = timed(lambda: [slow.positions(w) for w in vocab])
+        fast_cuts, fast_ms = timed(lambda: [fast.positions(w) for w in vocab])
+        assert slow_cuts == fast_cuts, "LiangHyphenator-ийн таслалт pyphen-оос зөрлөө"
+        print(f"{dic_path:15} {len(vocab):>7} үг  pyphen {len(vocab) / slow_ms * 1000:>10.0f} үг/с  "
+              f"native {len(vocab) / fast_ms * 1000:>10.0f} үг/с  {slow_ms / fast_ms:>5.1f}x")
+
+
+def make_paragraphs(n_paragraphs, words_per_paragraph, lang="mn", seed=42):
+    return [make_corpus(words_per_paragraph, lang, seed + i) for i in range(n_paragraphs)]
+
+
+def bench_parallel(algo_choice=4, just_type=4, width=60, n_paragraphs=400, words_per_paragraph=250):
+    paragraphs = make_paragraphs(n_paragraphs, words_per_paragraph)
+    workers_list = sorted({1, 2, 4, os.cpu_count() or 1})
+    print(f"{n_paragraphs} догол мөр x {words_per_paragraph} үг, алгоритм {algo_choice}, "
+          f"өргөн {width}, {os.cpu_count()} цөм")
+    hyph = bd.MultiLangHyphenator(engine="native")
+    baseline, base_ms = timed(lambda: list(bd.justify_paragraphs(paragraphs, algo_choice, just_type, width, hyph)))
+    print(f"{'serial':>8} {bd.format_ms(base_ms):>14}")
+    for workers in workers_list:
+        out, ms = timed(lambda: list(bd.parallel_justify(paragraphs, algo_choice, just_type, width, workers)))
+        assert out == baseline, "зэрэгцээ үр дүн дараалсан үр дүнгээс зөрлөө"
+        print(f"{workers:>8} {bd.format_ms(ms):>14} {base_ms / ms:>7.2f}x")
+
+
+def bench_incremental(n_paragraphs=200, words_per_paragraph=500, width=80, edits=200, algo="dp"):
+    paragraphs = make_paragraphs(n_paragraphs, words_per_paragraph)
+    text = "\n\n".join(" ".join(words) for words in paragraphs)
+    layout, build_ms = timed(bd.IncrementalLayout, text, width, algo)
+    rnd = random.Random(7)
+    edit_ms, full_ms = [], []
+    for _ in range(edits):
+        par = rnd.randrange(len(layout.paragraphs))
+        words = layout.paragraphs[par].words
+        _, ms = timed(layout.replace_word, par, rnd.randrange(len(words)), rnd.choice(words))
+        edit_ms.append(ms)
+    # Харьцуулалт: засвар бүрийн дараа бүх баримтыг шинээр жигдлэх
+    breaker = bd.dp_break if algo == "dp" else bd.greedy_break
+    for _ in range(3):
+        full_ms.append(timed(lambda: [breaker(p.words, width) for p in layout.paragraphs])[1])
+    print(f"{n_paragraphs * words_per_paragraph} үг, {algo}, өргөн {width}: анхны layout {bd.format_ms(build_ms)}")
+    print(f"  засвар:   median {bd.format_ms(statistics.median(edit_ms))}  p95 {bd.format_ms(bd.percentile(edit_ms, 95))}")
+    print(f"  бүтнээр:  median {bd.format_ms(statistics.median(full_ms))}")
+
+
+def bench_widths(width_counts=(5, 10, 20), algos=(1, 2, 3, 4), just_type=4, n_paragraphs=20,
+                 words_per_paragraph=300):
+    text = "\n\n".join(" ".join(words) for words in make_paragraphs(n_paragraphs, words_per_paragraph))
+    # Кэшгүй hyphenator: өргөн бүрт дахин таслах өнөөгийн зардлыг харуулна
+    hyph = bd.MultiLangHyphenator(cache_size=0, engine="native")
+    print(f"{'алгоритм':>8} {'өргөн':>6} {'өргөн бүрээр':>14} {'нэг дор':>14} {'хурдсалт':>8}")
+    for algo in algos:
+        for count in width_counts:
+            widths = [30 + 10 * k for k in range(count)]
+            loop, loop_ms = timed(lambda: {w: list(bd.iter_justified(text.splitlines(), algo, just_type, w, hyph))
+                                           for w in widths})
+            multi, multi_ms = timed(bd.justify_widths, text, widths, algo, just_type, hyph)
+            assert loop == multi, "justify_widths-ийн үр дүн зөрлөө"
+            print(f"{algo:>8} {count:>6} {bd.format_ms(loop_ms):>14} {bd.format_ms(multi_ms):>14} "
+                  f"{loop_ms / multi_ms:>7.2f}x")
+
+
+def bench_window(n_words=200_000, widths=(40, 80), windows=(200, 1000, 5000), lang="mn"):
+    # Нэг урт догол мөр: бүтэн dp_break ба цонхтой урсгал DP-ийн хурд, санах ой, чанар
+    words = make_corpus(n_words, lang)
+    print(f"{n_words} үг, нэг догол мөр")
+    print(f"{'өргөн':>6} {'цонх':>6} {'хугацаа':>12} {'эхний мөр':>12} {'оргил санах ой':>15} {'өртгийн зөрүү':>14}")
+    for width in widths:
+        full, full_ms = timed(bd.dp_break, words, width)
+        tracemalloc.start()
+        bd.dp_break(words, width)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        full_cost = bd.layout_cost(full, width)
+        print(f"{width:>6} {'бүтэн':>6} {bd.format_ms(full_ms):>12} {bd.format_ms(full_ms):>12} {peak / 1e6:>12.1f} MB")
+        for window in windows:
+            lines, first_ms = [], None
+            t0 = time.perf_counter()
+            for line in bd.window_dp_break(iter(words), width, window):
+                if first_ms is None:
+                    first_ms = (time.perf_counter() - t0) * 1000
+                lines.append(line)
+            total_ms = (time.perf_counter() - t0) * 1000
+            # санах ойг тусад нь хэмжинэ: мөрүүдийг хадгалахгүйгээр зөвхөн тоолно
+            tracemalloc.start()
+            for _ in bd.window_dp_break(iter(words), width, window):
+                pass
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            gap = 100 * (bd.layout_cost(lines, width) / full_cost - 1) if full_cost else 0.0
+            print(f"{width:>6} {window:>6} {bd.format_ms(total_ms):>12} {bd.format_ms(first_ms):>12} "
+                  f"{peak / 1e6:>12.1f} MB {gap:>13.3f}%")
+
+
+def traced(fn, *args, **kwargs):
+    # (үр дүн, үлдсэн санах ой, оргил санах ой) байтаар
+    tracemalloc.start()
+    result = fn(*args, **kwargs)
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, current, peak
+
+
+def bench_layout(n_words=1_000_000, width=80, just_type=4, lang="mn"):
+    # list[list[str]] ба BreakLayout: таслалтын үр дүн болон форматлах хүртэлх санах ой
+    words = make_corpus(n_words, lang)
+    hyph = bd.MultiLangHyphenator(engine="native")
+    breakers = {
+        "greedy_break": lambda compact: bd.greedy_break(words, width, compact=compact),
+        "fast_dp_break": lambda compact: bd.fast_dp_break(words, width, compact=compact),
+        # tracemalloc дор hyphenation удаан тул 10 дахин бага үгээр
+        "dp_with_hyphenation": lambda compact: bd.dp_with_hyphenation(words[:n_words // 10], width, hyph,
+                                                                     compact=compact),
+    }
+    bd.dp_with_hyphenation(words[:n_words // 10], width, hyph)  # толь ба кэшийг урьдчилан дүүргэнэ
+    print(f"{n_words} үг, өргөн {width}")
+    print(f"{'алгоритм':22} {'хэлбэр':>12} {'үр дүн':>10} {'оргил':>10} {'+формат оргил':>14}")
+    for name, run in breakers.items():
+        for compact in (False, True):
+            _, kept, peak = traced(run, compact)
+            _, _, fmt_peak = traced(lambda: bd.format_by_type(run(compact), just_type, width))
+            print(f"{name:22} {'BreakLayout' if compact else 'list':>12} {kept / 1e6:>7.1f} MB "
+                  f"{peak / 1e6:>7.1f} MB {fmt_peak / 1e6:>11.1f} MB")
+
+
+STARTUP_PROBE = r"""
+import json, sys, time
+t0 = time.perf_counter()
+import biydaalt2 as bd
+report = {"import_ms": (time.perf_counter() - t0) * 1000, "pyphen_imported": "pyphen" in sys.modules}
+hyph = bd.MultiLangHyphenator(engine=sys.argv[1])
+for word in sys.argv[2:]:
+    t0 = time.perf_counter()
+    hyph.hyphenate(word)
+    report[word] = (time.perf_counter() - t0) * 1000
+report["loaded"] = list(hyph.loaded)
+print(json.dumps(report))
+"""
+
+
+def bench_startup(engines=("native", "mapped", "pyphen"), words=("монгол", "hyphenation", "хэл"), runs=5):
+    # Шинэ процесс бүрт: импортын хугацаа ба үг бүрийн анхны дуудлагын хугацаа
+    here = os.path.dirname(os.path.abspath(__file__))
+    for engine in engines:
+        reports = [json.loads(subprocess.run([sys.executable, "-c", STARTUP_PROBE, engine, *words], cwd=here,
+                                             capture_output=True, text=True, check=True).stdout)
+                   for _ in range(runs)]
+        print(f"{engine}: import median {bd.format_ms(statistics.median(r['import_ms'] for r in reports))}"
+              f" (pyphen импортлогдсон: {reports[0]['pyphen_imported']})")
+        for word in words:
+            print(f"  анхны hyphenate('{word}'): median {bd.format_ms(statistics.median(r[word] for r in reports))}")
+        print(f"  ачаалсан толь: {', '.join(reports[0]['loaded'])}")
+
+
+INPUT_PROBE = r"""
+import json, os, resource, sys, time
+import biydaalt2 as bd
+mode, path, algo, just_type, width = sys.argv[1], sys.argv[2], *map(int, sys.argv[3:])
+t0 = time.perf_counter()
+with open(os.devnull, "w", encoding="utf-8") as dst:
+    if mode == "stream":
+        with open(path, encoding="utf-8") as src:
+            bd.justify_file(src, dst, algo, just_type, width)
+    else:
+        with bd.MappedText(path) as mapped:
+            for k, words in enumerate(mapped.paragraphs()):
+                if k:
+                    dst.write("\n")
+                dst.write("\n".join(bd.justify_words(words, algo, just_type, width, metrics=words.metrics())) + "\n")
+# ru_maxrss нь fork хийсэн эх процессын RSS-ийг өвлөдөг тул Linux дээр VmHWM-ийг уншина
+try:
+    with open("/proc/self/status") as f:
+        rss_kb = next(int(line.split()[1]) for line in f if line.startswith("VmHWM:"))
+except OSError:
+    rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print(json.dumps({"ms": (time.perf_counter() - t0) * 1000, "rss_mb": rss_kb / 1024}))
+"""
+
+
+def bench_cli_input(n_words=2_000_000, words_per_paragraph=200, width=80, algos=(1, 3), runs=3):
+    # CLI-ийн файл оролт: текст горимын урсгал уншигч ба MappedText (шинэ процесс бүрт, оргил RSS)
+    import tempfile
+    here = os.path.dirname(os.path.abspath(__file__))
+    words = make_corpus(n_words)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "corpus.txt")
+        with open(path, "w", encoding="utf-8") as f:
+            for i in range(0, n_words, words_per_paragraph):
+                f.write(" ".join(words[i:i + words_per_paragraph]) + "\n\n")
+        print(f"{n_words} үг, {os.path.getsize(path) / 1e6:.1f} MB, өргөн {width}")
+        print(f"{'алгоритм':>8} {'оролт':>8} {'хугацаа':>12} {'оргил RSS':>11}")
+        for algo in algos:
+            for mode in ("stream", "mmap"):
+                reports = [json.loads(subprocess.run([sys.executable, "-c", INPUT_PROBE, mode, path, str(algo), "1",
+                                                      str(width)], cwd=here, capture_output=True, text=True,
+                                                     check=True).stdout)
+                           for _ in range(runs)]
+                print(f"{algo:>8} {mode:>8} {bd.format_ms(statistics.median(r['ms'] for r in reports)):>12} "
+                      f"{max(r['rss_mb'] for r in reports):>8.1f} MB")
+
+
+def bench_hyphen_cache(n_words=50_000, runs=3, algo=4):
+    # CLI-г шинэ процессоор: байнгын кэшгүй, хоосон кэштэй (cold), дүүргэсэн кэштэй (warm)
+    import tempfile
+    here = os.path.dirname(os.path.abspath(__file__))
+    words = make_corpus(n_words // 2, "mn") + make_corpus(n_words - n_words // 2, "en")
+    random.Random(1).shuffle(words)
+    with tempfile.TemporaryDirectory() as tmp:
+        corpus, db = os.path.join(tmp, "corpus.txt"), os.path.join(tmp, "hyph.db")
+        with open(corpus, "w", encoding="utf-8") as f:
+            for i in range(0, len(words), 200):
+                f.write(" ".join(words[i:i + 200]) + "\n\n")
+
+        def run(*extra, fresh=False):
+            times = []
+            for _ in range(runs):
+                if fresh:
+                    for suffix in ("", "-wal", "-shm"):
+                        if os.path.exists(db + suffix):
+                            os.remove(db + suffix)
+                t0 = time.perf_counter()
+                subprocess.run([sys.executable, "biydaalt2.py", corpus, "-a", str(algo), "-q", "-o", os.devnull,
+                                *extra], cwd=here, check=True)
+                times.append((time.perf_counter() - t0) * 1000)
+            return statistics.median(times)
+
+        plain = run()
+        cold = run("--hyphen-cache", db, fresh=True)
+        t0 = time.perf_counter()
+        subprocess.run([sys.executable, "biydaalt2.py", corpus, "--hyphen-cache", db, "--warm-cache", "-q"],
+                       cwd=here, check=True)
+        warm_up = (time.perf_counter() - t0) * 1000
+        warm = run("--hyphen-cache", db)
+    print(f"{n_words} үг, -a {algo}, {runs} ажиллуулалтын медиан (процесс эхлэхээс дуустал)")
+    print(f"  кэшгүй:              {bd.format_ms(plain):>12}")
+    print(f"  хоосон кэш (cold):   {bd.format_ms(cold):>12}")
+    print(f"  --warm-cache:        {bd.format_ms(warm_up):>12}")
+    print(f"  дүүргэсэн кэш (warm): {bd.format_ms(warm):>12}  ({plain / warm:.2f}x)")
+
+
+def bench_layout_cache(n_paragraphs=400, words_per_paragraph=150, duplicate=0.3, width=80):
+    # Бүх жигдлэлийн төрлөөр дараалан, догол мөрийн duplicate хэсэг нь давтагдсан баримт
+    rnd = random.Random(7)
+    unique = [make_corpus(words_per_paragraph, "mn", seed=k) for k in range(n_paragraphs)]
+    paragraphs = [rnd.choice(unique[:20]) if rnd.random() < duplicate else p for p in unique]
+    hyph = bd.MultiLangHyphenator(engine="native")
+    print(f"{n_paragraphs} догол мөр x {words_per_paragraph} үг, {duplicate:.0%} давтагдсан, төрөл 1-4")
+    for algo in (1, 3, 4):
+        cache = bd.LayoutCache(4096)
+        run = lambda c: [list(bd.justify_paragraphs(paragraphs, algo, t, width, hyph, c)) for t in (1, 2, 3, 4)]
+        plain, plain_ms = timed(run, None)
+        cached, cached_ms = timed(run, cache)
+        assert plain == cached, "LayoutCache-ийн үр дүн зөрлөө"
+        st = cache.stats()
+        print(f"  {bd.ALGORITHM_NAMES[algo - 1]:12} кэшгүй {bd.format_ms(plain_ms):>12}  "
+              f"кэштэй {bd.format_ms(cached_ms):>12}  ({plain_ms / cached_ms:.1f}x, hit {st['hit_rate']:.0%})")
+
+
+ALGORITHMS = {
+    "greedy_break": lambda words, width, hyph: bd.greedy_break(words, width),
+    "greedy_justify_with_hyphenation": lambda words, width, hyph: bd.greedy_justify_with_hyphenation(words, width, hyph),
+    "dp_break": lambda words, width, hyph: bd.dp_break(words, width),
+    "fast_dp_break": lambda words, width, hyph: bd.fast_dp_break(words, width),
+    "dp_justify_with_hyphenation": lambda words, width, hyph: bd.dp_justify_with_hyphenation(" ".join(words), width),
+    "dp_with_hyphenation": lambda words, width, hyph: bd.dp_with_hyphenation(words, width, hyph),
+}
+
+
+def summarize(samples):
+    return {
+        "min_ms": min(samples),
+        "median_ms": statistics.median(samples),
+        "p95_ms": bd.percentile(samples, 95),
+        "mean_ms": statistics.fmean(samples),
+        "samples_ms": samples,
+    }
+
+
+def measure(fn, warmup=1, repeat=5):
+    for _ in range(warmup):
+        fn()
+    return [timed(fn)[1] for _ in range(repeat)]
+
+
+def run_suite(sizes=(1_000, 10_000, 50_000), widths=(40, 80), langs=("mn", "en"),
+              algorithms=tuple(ALGORITHMS), warmup=1, repeat=5, seed=42):
+    # Hyphenator-ийн кэшийг унтраана: давталт бүр ижил ажил хийнэ
+    hyph = bd.MultiLangHyphenator(cache_size=0, engine="native")
+    results = []
+    for lang in langs:
+        for n in sizes:
+            words = make_corpus(n, lang, seed)
+            for width in widths:
+                for name in algorithms:
+                    fn = ALGORITHMS[name]
+                    samples = measure(lambda: fn(words, width, hyph), warmup, repeat)
+                    row = {"algorithm": name, "lang": lang, "words": n, "width": width, **summarize(samples)}
+                    results.append(row)
+                    print(f"{name:32} {lang:>3} {n:>8} {width:>5} "
+                          f"median {bd.format_ms(row['median_ms']):>14}  p95 {bd.format_ms(row['p95_ms']):>14}")
+    return {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "seed": seed,
+            "warmup": warmup,
+            "repeat": repeat,
+        },
+        "results": results,
+    }
+
+
+def compare_results(old, new, threshold=1.10):
+    # Медиан хугацаа threshold-оос их өссөн хэмжилтүүдийг буцаана
+    key = lambda r: (r["algorithm"], r["lang"], r["words"], r["width"])
+    before = {key(r): r for r in old["results"]}
+    regressions = []
+    for row in new["results"]:
+        prev = before.get(key(row))
+        if prev and row["median_ms"] > prev["median_ms"] * threshold:
+            regressions.append((key(row), prev["median_ms"], row["median_ms"]))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Мөр хуваах алгоритмуудын хурдны хэмжилт")
+    parser.add_argument("--sizes", type=int, nargs="+", help="үгийн тоо (dp: 1e5 1e6, scaling: 1e3 1e4 5e4)")
+    parser.add_argument("--widths", type=int, nargs="+", help="мөрийн өргөн (dp: 80 1000, scaling: 40 80)")
+    parser.add_argument("--lang", choices=["mn", "en"])
+    parser.add_argument("--suite", choices=["dp", "hyphen", "parallel", "scaling", "incremental", "widths", "startup", "window", "layout", "hyphen-cache", "layout-cache", "cli-input"], default="dp")
+    parser.add_argument("--algorithms", nargs="+", choices=list(ALGORITHMS), default=list(ALGORITHMS))
+    parser.add_argument("--warmup", type=int, default=1)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--json", help="scaling үр дүнг JSON-оор хадгалах файл")
+    parser.add_argument("--baseline", help="өмнөх JSON үр дүн; медиан 10%%-иас их удааширвал мэдээлнэ")
+    args = parser.parse_args(argv)
+    if args.suite == "scaling":
+        report = run_suite(args.sizes or (1_000, 10_000, 50_000), args.widths or (40, 80),
+                           ("mn", "en") if args.lang is None else (args.lang,),
+                           args.algorithms, args.warmup, args.repeat)
+        if args.json:
+            with open(args.json, "w", encoding="utf-8") as f:
+                json.dump(report, f, ensure_ascii=False, indent=2)
+            print(f"Хадгаллаа: {args.json}")
+        if args.baseline:
+            with open(args.baseline, "r", encoding="utf-8") as f:
+                regressions = compare_results(json.load(f), report)
+            for key, before, after in regressions:
+                print(f"УДААШРАЛ {key}: {bd.format_ms(before)} -> {bd.format_ms(after)}")
+            return 1 if regressions else 0
+    elif args.suite == "hyphen":
+        bench_hyphenation()
+    elif args.suite == "parallel":
+        bench_parallel()
+    elif args.suite == "incremental":
+        bench_incremental()
+    elif args.suite == "widths":
+        bench_widths()
+    elif args.suite == "startup":
+        bench_startup()
+    elif args.suite == "layout-cache":
+        bench_layout_cache(width=(args.widths or [80])[0])
+    elif args.suite == "hyphen-cache":
+        bench_hyphen_cache(args.sizes[0] if args.sizes else 50_000, algo=4)
+    elif args.suite == "layout":
+        bench_layout(args.sizes[0] if args.sizes else 1_000_000, (args.widths or [80])[0], lang=args.lang or "mn")
+    elif args.suite == "cli-input":
+        bench_cli_input(args.sizes[0] if args.sizes else 2_000_000, width=(args.widths or [80])[0])
+    elif args.suite == "window":
+        bench_window(args.sizes[0] if args.sizes else 200_000, args.widths or (40, 80), lang=args.lang or "mn")
+    else:
+        bench_dp_scaling(args.sizes or [100_000, 1_000_000], args.widths or [80, 1000], args.lang or "mn")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,56 +1,675 @@
-import pyphen
+import bisect
+import functools
+import mmap
+import glob
+import gzip
+import heapq
+import itertools
+import json
 import math
+import operator
 import time
 import sys
 import os
+import queue
+import re
+import struct
+import threading
+from array import array
+from collections import OrderedDict, deque
+
+class LRUCache:
+    # Хэмжээ нь хязгаарлагдсан LRU кэш; олон thread-ээс зэрэг хэрэглэж болно
+    def __init__(self, maxsize=4096):
+        self.maxsize = maxsize
+        self.data = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = self.misses = self.evictions = 0
+
+    def get(self, key, default=None):
+        with self.lock:
+            try:
+                value = self.data[key]
+            except KeyError:
+                self.misses += 1
+                return default
+            self.data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        if self.maxsize <= 0:
+            return
+        with self.lock:
+            self.data[key] = value
+            self.data.move_to_end(key)
+            while len(self.data) > self.maxsize:
+                self.data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self.lock:
+            self.data.clear()
+            self.hits = self.misses = self.evictions = 0
+
+    def __len__(self):
+        return len(self.data)
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "size": len(self.data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+
+# ==================== HYPHENATION PATTERNS ====================
+
+DIC_KEYWORDS = ('LEFTHYPHENMIN', 'RIGHTHYPHENMIN', 'COMPOUNDLEFTHYPHENMIN',
+                'COMPOUNDRIGHTHYPHENMIN', 'NOHYPHEN', 'NEXTLEVEL')
+
+
+def iter_dic_lines(path):
+    # hyph_*.dic-ийн эхний мөр нь кодчилол; ^^hh-г жинхэнэ тэмдэгтээр солино
+    with open(path, 'rb') as f:
+        encoding = f.readline().decode().strip()
+        if encoding.lower() == 'microsoft-cp1251':
+            encoding = 'cp1251'
+        for raw in f:
+            line = raw.decode(encoding).strip()
+            if not line or line.startswith(('%', '#')):
+                continue
+            yield re.sub(r'\^{2}([0-9a-f]{2})', lambda m: chr(int(m.group(1), 16)), line)
+
+
+def parse_dic_keyword(line, rules):
+    key, _, value = line.partition(' ')
+    if key == 'NOHYPHEN':
+        rules['NOHYPHEN'] = tuple(v for v in value.split(',') if v)
+    elif key != 'NEXTLEVEL':
+        rules[key] = int(value)
+
+
+def read_dic_header(path):
+    rules = {'LEFTHYPHENMIN': 0, 'RIGHTHYPHENMIN': 0, 'NOHYPHEN': ()}
+    for line in iter_dic_lines(path):
+        if not line.startswith(DIC_KEYWORDS):
+            break
+        parse_dic_keyword(line, rules)
+    return rules
+
+
+def strip_nohyphen(word, cuts, nohyphen):
+    # libhyphen-ий адил: NOHYPHEN тэмдэгтийн өмнө болон ард таслахгүй
+    if not nohyphen or not cuts:
+        return cuts
+    banned = set()
+    for nh in nohyphen:
+        k = word.find(nh)
+        while k != -1:
+            banned.add(k)
+            banned.add(k + len(nh))
+            k = word.find(nh, k + 1)
+    return [c for c in cuts if c not in banned] if banned else cuts
+
+
+class LiangHyphenator:
+    # Liang-ийн загваруудыг trie-д ачаалж, таслах байрлалыг шууд int-ээр буцаана
+    def __init__(self, path, left=2, right=2):
+        rules = {'LEFTHYPHENMIN': 0, 'RIGHTHYPHENMIN': 0, 'NOHYPHEN': ()}
+        self.children = [{}]
+        self.points = [None]
+        for line in iter_dic_lines(path):
+            if line.startswith(DIC_KEYWORDS):
+                parse_dic_keyword(line, rules)
+            else:
+                self.add_pattern(line.split('/', 1)[0])
+        self.left = max(left, rules['LEFTHYPHENMIN'])
+        self.right = max(right, rules['RIGHTHYPHENMIN'])
+        self.nohyphen = rules['NOHYPHEN']
+
+    def add_pattern(self, pattern):
+        chars, values = [], [0]
+        for ch in pattern:
+            if ch.isdigit():
+                values[-1] = int(ch)
+            else:
+                chars.append(ch)
+                values.append(0)
+        points = tuple((k, v) for k, v in enumerate(values) if v)
+        if not points:
+            return
+        node = 0
+        for ch in chars:
+            child = self.children[node].get(ch)
+            if child is None:
+                child = len(self.children)
+                self.children[node][ch] = child
+                self.children.append({})
+                self.points.append(None)
+            node = child
+        self.points[node] = points
+
+    def positions(self, word):
+        w = '.' + word.lower() + '.'
+        size = len(w)
+        refs = [0] * (size + 1)
+        children, points = self.children, self.points
+        root = children[0]
+        for i in range(size - 1):
+            node = root.get(w[i])
+            j = i + 1
+            while node is not None:
+                pts = points[node]
+                if pts:
+                    for k, v in pts:
+                        if v > refs[i + k]:
+                            refs[i + k] = v
+                if j == size:
+                    break
+                node = children[node].get(w[j])
+                j += 1
+        cuts = [k - 1 for k in range(self.left + 1, len(word) - self.right + 2) if refs[k] & 1]
+        return strip_nohyphen(word, cuts, self.nohyphen)
+
+
+class PyphenHyphenator:
+    # pyphen-ийг ороож, .dic-ийн LEFT/RIGHTHYPHENMIN, NOHYPHEN дүрмийг мөрдүүлнэ
+    def __init__(self, path, left=2, right=2):
+        rules = read_dic_header(path)
+        self.left = max(left, rules['LEFTHYPHENMIN'])
+        self.right = max(right, rules['RIGHTHYPHENMIN'])
+        self.nohyphen = rules['NOHYPHEN']
+        import pyphen
+        self.dic = pyphen.Pyphen(filename=path, left=self.left, right=self.right)
+
+    def positions(self, word):
+        cuts, k = [], 0
+        for ch in self.dic.inserted(word):
+            if k < len(word) and ch == word[k]:
+                k += 1
+            elif ch == '-':
+                cuts.append(k)
+        return strip_nohyphen(word, cuts, self.nohyphen)
+
+
+# Хөрвүүлсэн толь: LiangHyphenator-ийн trie-г mmap хийж болох хоёртын файлд хадгална.
+# Процесс бүр dict үүсгэлгүй шууд уншиж, олон ажилчин ижил физик хуудсыг хуваалцана.
+#   толгой | keys Q[table] | kids I[table] | point_at I[nodes + 1] | points B[...] | NOHYPHEN
+# (зангилаа, тэмдэгт) ирмэгүүд нээлттэй хаягжилттай hash хүснэгтэд: key = node << 21 | ord(ch),
+# 0 нь хоосон нүд. Зангилааны (k, v) цэгүүд points[point_at[node]:point_at[node + 1]]-д.
+COMPILED_MAGIC = b"HYPHBIN1"
+COMPILED_HEADER = struct.Struct("<8s20sQQIIIIII")
+EDGE_HASH = 0x9E3779B1
+
+
+def align8(n):
+    return n + (-n % 8)
+
+
+def compiled_path(path):
+    # HYPH_CACHE_DIR (анхдагч нь ~/.cache/biydaalt2) дотор; ижил нэртэй өөр толиудыг замаар нь
+    # ялгана. Эхлэлийг хурдан байлгахын тулд hashlib/tempfile импортлохгүй.
+    import zlib
+    folder = os.environ.get("HYPH_CACHE_DIR") or os.path.join(
+        os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache"), "biydaalt2")
+    tag = zlib.crc32(os.path.abspath(path).encode("utf-8"))
+    return os.path.join(folder, f"{os.path.basename(path)}.{tag:08x}.bin")
+
+
+def compile_dic(path, out=None):
+    import hashlib
+    st = os.stat(path)
+    with open(path, 'rb') as f:
+        digest = hashlib.sha1(f.read()).digest()
+    trie = LiangHyphenator(path, left=0, right=0)
+    table = 1 << max(4, (2 * len(trie.children)).bit_length())  # дүүргэлт <= 0.5
+    mask = table - 1
+    keys, kids = array('Q', bytes(8 * table)), array('I', bytes(4 * table))
+    for node, children in enumerate(trie.children):
+        for ch, child in children.items():
+            h = (node * EDGE_HASH + ord(ch)) & mask
+            while keys[h]:
+                h = (h + 1) & mask
+            keys[h], kids[h] = node << 21 | ord(ch), child
+    point_at, points = array('I', [0]), array('B')
+    for pts in trie.points:
+        for k, v in pts or ():
+            points.extend((k, v))
+        point_at.append(len(points))
+    nohyphen = "\0".join(trie.nohyphen).encode("utf-8")
+    header = COMPILED_HEADER.pack(COMPILED_MAGIC, digest, st.st_mtime_ns, st.st_size, trie.left, trie.right,
+                                  len(trie.children), table, len(points), len(nohyphen))
+    out = out or compiled_path(path)
+    os.makedirs(os.path.dirname(out) or ".", exist_ok=True)
+    # Түр файлд бичээд os.replace: зэрэг ачаалж буй процессууд хагас файл уншихгүй
+    tmp = f"{out}.{os.getpid()}.tmp"
+    with open(tmp, 'wb') as f:
+        for part in (header, keys, kids, point_at, points, nohyphen):
+            data = bytes(part)
+            f.write(data + bytes(-len(data) % 8))
+    os.replace(tmp, out)
+    return out
+
+
+def compiled_dic(path):
+    # .dic-ийн хөрвүүлсэн файл; байхгүй эсвэл .dic өөрчлөгдсөн бол дахин хөрвүүлнэ
+    out = compiled_path(path)
+    st = os.stat(path)
+    try:
+        with open(out, 'rb') as f:
+            header = COMPILED_HEADER.unpack(f.read(COMPILED_HEADER.size))
+    except (OSError, struct.error):
+        return compile_dic(path, out)
+    if header[0] == COMPILED_MAGIC:
+        if header[2:4] == (st.st_mtime_ns, st.st_size):
+            return out
+        import hashlib
+        with open(path, 'rb') as f:
+            if hashlib.sha1(f.read()).digest() == header[1]:
+                # Зөвхөн mtime өөрчлөгдсөн: дараагийн эхлэлд дахин hash хийхгүйн тулд
+                # толгойг шинэчилнэ (compile_dic шиг түр файл + os.replace)
+                with open(out, 'rb') as f:
+                    data = bytearray(f.read())
+                COMPILED_HEADER.pack_into(data, 0, header[0], header[1], st.st_mtime_ns, st.st_size, *header[4:])
+                tmp = f"{out}.{os.getpid()}.tmp"
+                with open(tmp, 'wb') as f:
+                    f.write(data)
+                os.replace(tmp, out)
+                return out
+    return compile_dic(path, out)
+
+
+class MappedHyphenator:
+    # LiangHyphenator-тэй ижил таслалт, гэхдээ trie-г compile_dic()-ийн файлаас mmap-аар уншина
+    def __init__(self, path, left=2, right=2):
+        self.path = compiled_dic(path)
+        with open(self.path, 'rb') as f:
+            self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        (_, _, _, _, dic_left, dic_right, nodes, table, n_points, n_nohyphen) = COMPILED_HEADER.unpack_from(self.mm)
+        view, off = memoryview(self.mm), align8(COMPILED_HEADER.size)
+        sections = []
+        for size in (8 * table, 4 * table, 4 * (nodes + 1), n_points, n_nohyphen):
+            sections.append(view[off:off + size])
+            off += align8(size)
+        self.keys, self.kids = sections[0].cast('Q'), sections[1].cast('I')
+        self.point_at, self.points = sections[2].cast('I'), sections[3]
+        self.nohyphen = tuple(v for v in bytes(sections[4]).decode("utf-8").split("\0") if v)
+        self.mask = table - 1
+        self.left = max(left, dic_left)
+        self.right = max(right, dic_right)
+
+    def positions(self, word):
+        # Ирмэг бүрийг mmap-ийн hash хүснэгтээс шууд уншина: процесс бүрд хувийн санах ой
+        # үүсгэхгүй. Давтагдсан үгийг MultiLangHyphenator-ийн LRU кэш хариулна.
+        w = '.' + word.lower() + '.'
+        size = len(w)
+        refs = [0] * (size + 1)
+        codes = [ord(ch) for ch in w]
+        keys, kids, point_at, points, mask = self.keys, self.kids, self.point_at, self.points, self.mask
+        for i in range(size - 1):
+            node = 0
+            for j in range(i, size):
+                key = node << 21 | codes[j]
+                h = (node * EDGE_HASH + codes[j]) & mask
+                found = keys[h]
+                while found != key:
+                    if not found:
+                        break
+                    h = (h + 1) & mask
+                    found = keys[h]
+                else:
+                    node = kids[h]
+                    for t in range(point_at[node], point_at[node + 1], 2):
+                        k, v = i + points[t], points[t + 1]
+                        if v > refs[k]:
+                            refs[k] = v
+                    continue
+                break
+        cuts = [k - 1 for k in range(self.left + 1, len(word) - self.right + 2) if refs[k] & 1]
+        return strip_nohyphen(word, cuts, self.nohyphen)
+
+    def close(self):
+        for name in ("keys", "kids", "point_at", "points"):
+            getattr(self, name).release()
+        self.mm.close()
+
+
+def dic_fingerprint(path):
+    # Байнгын кэшийн түлхүүр: файлын нэр + агуулгын sha1 (.dic засагдвал өөр түлхүүр болно)
+    import hashlib
+    with open(path, 'rb') as f:
+        return f"{os.path.basename(path)}:{hashlib.sha1(f.read()).hexdigest()}"
+
+
+class HyphenStore:
+    # Үг -> таслах цэгүүдийн байнгын SQLite кэш, ажиллуулалт хооронд хуваалцана.
+    # WAL горимд олон процесс зэрэг уншиж, бичигч нь уншигчдыг хаахгүй.
+    BATCH = 500  # нэг SELECT дахь параметрийн тоо
+
+    def __init__(self, path):
+        import sqlite3
+        self.path = path
+        self.db = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")  # WAL-д commit бүрт fsync хийхгүй
+        self.db.execute("CREATE TABLE IF NOT EXISTS cuts (dic TEXT NOT NULL, word TEXT NOT NULL, "
+                        "cuts TEXT NOT NULL, PRIMARY KEY (dic, word)) WITHOUT ROWID")
+        self.db.commit()
+        self.lock = threading.Lock()
+        self.hits = self.misses = self.writes = 0
+
+    def get_many(self, dic, words):
+        found = {}
+        with self.lock:
+            for i in range(0, len(words), self.BATCH):
+                part = words[i:i + self.BATCH]
+                rows = self.db.execute("SELECT word, cuts FROM cuts WHERE dic = ? AND word IN (%s)"
+                                       % ",".join("?" * len(part)), (dic, *part))
+                found.update((w, tuple(map(int, c.split(","))) if c else ()) for w, c in rows)
+            self.hits += len(found)
+            self.misses += len(words) - len(found)
+        return found
+
+    def get(self, dic, word):
+        return self.get_many(dic, [word]).get(word)
+
+    def put_many(self, dic, items):
+        rows = [(dic, w, ",".join(map(str, cuts))) for w, cuts in items]
+        with self.lock, self.db:
+            self.db.executemany("INSERT OR IGNORE INTO cuts VALUES (?, ?, ?)", rows)
+            self.writes += len(rows)
+
+    def prune(self, dic):
+        # Ижил нэртэй толины хуучин хувилбарын мөрүүдийг устгана
+        name = dic.partition(":")[0] + ":"
+        with self.lock, self.db:
+            return self.db.execute("DELETE FROM cuts WHERE substr(dic, 1, ?) = ? AND dic != ?",
+                                   (len(name), name, dic)).rowcount
+
+    def count(self, dic=None):
+        with self.lock:
+            if dic is None:
+                return self.db.execute("SELECT COUNT(*) FROM cuts").fetchone()[0]
+            return self.db.execute("SELECT COUNT(*) FROM cuts WHERE dic = ?", (dic,)).fetchone()[0]
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses, "writes": self.writes,
+                "hit_rate": self.hits / total if total else 0.0}
+
+    def close(self):
+        with self.lock:
+            self.db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# Бичгийн ангилал: UTF-8 дээр кирилл (U+0400-04FF) үсэг бүр 0xD0-0xD3 байтаар,
+# латин үсэг A-Za-z-ээр эхэлдэг. Байт бүрийг 'c'/'l' болгож бусдыг устгаад,
+# давтагдсан тэмдгийг нэгтгэвэл үг бүр '', 'c', 'l', 'cl', 'lc', ... болно.
+SCRIPT_TABLE = bytes(ord('c') if 0xD0 <= b <= 0xD3 else ord('l') if chr(b).isascii() and chr(b).isalpha() else b
+                     for b in range(256))
+SCRIPT_DELETE = bytes(b for b in range(256) if SCRIPT_TABLE[b] not in b'cl\n')
+SCRIPT_RUNS = (re.compile(rb'cc+'), re.compile(rb'll+'))
+# Үсэггүй үг болон холимог үгийг (жишээ нь "USB-кабель") өмнөх шигээ mn тольд өгнө
+SCRIPT_TAGS = {b'': 'mn', b'c': 'mn', b'l': 'en'}
+# Нэг үгийг ангилах хурдан зам (classify_scripts-тэй ижил дүрэм)
+CYRILLIC_LETTER = re.compile('[\u0400-\u04FF]')
+LATIN_LETTER = re.compile('[A-Za-z]')
+
+
+def classify_scripts(words):
+    # Үг бүрийг 'mn' / 'en' / 'mixed' гэж нэг дамжлагаар ангилна
+    doc = "\n".join(words).encode('utf-8').translate(SCRIPT_TABLE, SCRIPT_DELETE)
+    doc = SCRIPT_RUNS[1].sub(b'l', SCRIPT_RUNS[0].sub(b'c', doc))
+    return [SCRIPT_TAGS.get(p, 'mixed') for p in doc.split(b'\n')] if words else []
+
+
+# Хэлний бүртгэл: код -> (.dic зам, pyphen-ий нөөц хэлний код)
+LANGUAGES = {
+    'mn': ('hyph_mn_MN.dic', 'mn'),
+    'en': ('hyph_en_US.dic', 'en_US'),
+}
+
+
+def register_language(code, path, fallback=None):
+    LANGUAGES[code] = (path, fallback)
+
+
+def bundled_dic(code):
+    # pyphen-д хамт ирдэг толь; pyphen-ийг зөвхөн энд хэрэгтэй үед нь импортлоно
+    import pyphen
+    return pyphen.LANGUAGES[pyphen.language_fallback(code)]
+
+
+# engine нэр -> толь ачаалагч класс; бусад нэр pyphen-ийг ашиглана
+ENGINES = {"native": LiangHyphenator, "mapped": MappedHyphenator}
+
 
 class MultiLangHyphenator:
-    def __init__(self):
+    # Толь бичгүүдийг анх хэрэгтэй болох үед нь ачаална; max_loaded нь санах ойд
+    # зэрэг байх толины дээд тоо (хамгийн удаан хэрэглээгүйг нь буулгана).
+    # store (HyphenStore эсвэл SQLite файлын зам) өгвөл LRU-д байхгүй үгийг тэндээс
+    # хайж, шинээр бодсоныг flush_store() үед бичнэ.
+    def __init__(self, cache_size=4096, engine="pyphen", max_loaded=None, store=None):
+        self.cache = LRUCache(cache_size)
+        self.store = HyphenStore(store) if isinstance(store, str) else store
+        self.dic_keys = {}
+        self.pending = {}
+        self.engine = ENGINES.get(engine, PyphenHyphenator)
+        self.languages = dict(LANGUAGES)
+        self.max_loaded = max_loaded
+        self.loaded = OrderedDict()
+        self.load_ms = {}
+        self.lock = threading.Lock()
+
+    def register(self, code, path, fallback=None):
+        with self.lock:
+            self.languages[code] = (path, fallback)
+            self.loaded.pop(code, None)
+            # Хуучин толиор бодсон таслалт: бичигдээгүйг нь хаяж, LRU-г бүхэлд нь цэвэрлэнэ
+            # (түлхүүргүй үг болон fallback-аар энэ хэлийг ашигласан үгс ч хуучирна)
+            self.pending.pop(self.dic_keys.pop(code, None), None)
+            self.cache.clear()
+
+    def _load(self, lang):
+        path, fallback = self.languages[lang]
         try:
-            self.mn_dic = pyphen.Pyphen(filename='hyph_mn_MN.dic')
+            return self.engine(path)
         except Exception as e:
-            print(f"hyph_mn_MN.dic олдсонгүй: {e} -> lang='mn'")
-            self.mn_dic = pyphen.Pyphen(lang='mn')
-
+            if not fallback:
+                print(f"{path} олдсонгүй: {e}")
+                return None
+            print(f"{path} олдсонгүй: {e} -> lang='{fallback}'")
         try:
-            self.en_dic = pyphen.Pyphen(filename='hyph_en_US.dic')
-        except Exception as e:
-            print(f"hyph_en_US.dic олдсонгүй: {e} -> lang='en_US'")
+            return self.engine(bundled_dic(fallback))
+        except Exception:
+            print(f"'{lang}' хэлний толь байхгүй.")
+            return None
+
+    def dictionary(self, lang):
+        with self.lock:
+            if lang in self.loaded:
+                self.loaded.move_to_end(lang)
+                return self.loaded[lang]
+            t0 = time.perf_counter()
+            dic = self._load(lang)
+            self.load_ms[lang] = (time.perf_counter() - t0) * 1000
+            self.loaded[lang] = dic
+            if self.max_loaded is not None and len(self.loaded) > self.max_loaded:
+                self.loaded.popitem(last=False)
+            return dic
+
+    def tag_words(self, words):
+        # Баримтын үгсийг нэг дор ангилж {үг: tag} буцаана. Hyphenator-ыг thread-үүд
+        # хуваалцдаг тул өөрт нь хадгалахгүй; дуудагч detect_lang(w, tags[w])-д дамжуулна.
+        return dict(zip(words, classify_scripts(words)))
+
+    def detect_lang(self, word: str, script=None) -> str:
+        if script is None:
+            return 'en' if LATIN_LETTER.search(word) and not CYRILLIC_LETTER.search(word) else 'mn'
+        return 'en' if script == 'en' else 'mn'
+
+    def dic_key(self, lang):
+        # lang-ийн толины байнгын кэшийн түлхүүр; толийг ачаалахгүйгээр файлаас нь бодно
+        if lang not in self.languages:
+            lang = 'mn'
+        key = self.dic_keys.get(lang)
+        if key is None:
+            path, fallback = self.languages[lang]
             try:
-                self.en_dic = pyphen.Pyphen(lang='en_US')
+                if not os.path.isfile(path) and fallback:
+                    path = bundled_dic(fallback)
+                key = dic_fingerprint(path)
             except Exception:
-                print("English dictionary байхгүй, зөвхөн Mongolian ашиглана.")
-                self.en_dic = None
-
-    def detect_lang(self, word: str) -> str:
-        has_cyr = any('\u0400' <= ch <= '\u04FF' for ch in word)
-        has_lat = any(('A' <= ch <= 'Z') or ('a' <= ch <= 'z') for ch in word)
-        if has_cyr and not has_lat:
-            return 'mn'
-        if has_lat and not has_cyr:
-            return 'en'
-        return 'mn'
-
-    def hyphenate(self, word):
+                key = ""
+            self.dic_keys[lang] = key
+        return key or None
+
+    def hyphenate(self, word, lang=None, script=None):
+        # script: tag_words()-ээр урьдчилан бодсон бичгийн ангилал
+        return self._hyphenate(word, lang, True, script)
+
+    def _hyphenate(self, word, lang, lookup, script=None):
+        key = word if lang is None else (lang, word)
+        cuts = self.cache.get(key)
+        if cuts is not None:
+            return list(cuts)
         try:
-            dic = self.en_dic if self.detect_lang(word) == 'en' and self.en_dic else self.mn_dic
-            inserted = dic.inserted(word)
-            return [i for i, c in enumerate(inserted) if c == "-"]
+            lang = lang or self.detect_lang(word, script)
+            dic_key = self.dic_key(lang) if self.store is not None else None
+            cuts = self.store.get(dic_key, word) if lookup and dic_key else None
+            if cuts is None:
+                dic = self.dictionary(lang) if lang in self.languages else None
+                if dic is None and lang != 'mn':
+                    dic = self.dictionary('mn')
+                cuts = tuple(dic.positions(word))
+                if dic_key:
+                    self.pending.setdefault(dic_key, []).append((word, cuts))
         except Exception:
             return []
+        self.cache.put(key, cuts)
+        return list(cuts)
+
+    def flush_store(self):
+        # Шинээр бодсон таслалтуудыг байнгын кэшэд нэг transaction-оор бичнэ
+        if self.store is None:
+            return 0
+        with self.lock:
+            pending, self.pending = self.pending, {}
+        for dic_key, items in pending.items():
+            self.store.put_many(dic_key, items)
+        return sum(map(len, pending.values()))
+
+    def _stored(self, vocab, scripts):
+        groups = {}
+        for w in vocab:
+            dic_key = self.dic_key(self.detect_lang(w, scripts[w]))
+            if dic_key:
+                groups.setdefault(dic_key, []).append(w)
+        found = {}
+        for dic_key, group in groups.items():
+            found.update(self.store.get_many(dic_key, group))
+        return found
+
+    def hyphenate_many(self, words, executor=None, chunk=20_000):
+        # Бүх токеныг нэг дор: ялгаатай үг бүрийг нэг л удаа таслаж HyphenTable буцаана.
+        # Байнгын кэшээс олдоогүй үгсийн тоо chunk-аас их бол executor (thread эсвэл
+        # make_pool()) дээр хуваан бодно.
+        vocab = list(dict.fromkeys(words))
+        scripts = self.tag_words(vocab)
+        cut_of = self._stored(vocab, scripts) if self.store is not None else {}
+        todo = [w for w in vocab if w not in cut_of]
+        if executor is None or len(todo) <= chunk:
+            cut_of.update((w, self.hyphenate(w, script=scripts[w])) for w in todo)
+        else:
+            from concurrent.futures import ThreadPoolExecutor
+            # Thread-үүд энэ hyphenator-ыг хуваалцана; процессууд өөрийн _worker_hyph-ийг ашиглана
+            shared = self if isinstance(executor, ThreadPoolExecutor) else None
+            parts = [todo[i:i + chunk] for i in range(0, len(todo), chunk)]
+            for part, cuts in zip(parts, executor.map(_hyphenate_chunk, parts, itertools.repeat(shared))):
+                cut_of.update(zip(part, cuts))
+                if shared is None:
+                    for w, c in zip(part, cuts):
+                        self.cache.put(w, tuple(c))
+                        dic_key = self.store is not None and self.dic_key(self.detect_lang(w, scripts[w]))
+                        if dic_key:
+                            self.pending.setdefault(dic_key, []).append((w, tuple(c)))
+        self.flush_store()
+        return HyphenTable(vocab, [cut_of[w] for w in vocab], words)
+
+    def cache_stats(self):
+        return self.cache.stats()
+
+
+class HyphenTable:
+    # Токен бүрийн таслах цэгүүдийн авсаархан хүснэгт. Үгийн сангийн v-р үгийн
+    # таслалтууд нь cuts[offsets[v]:offsets[v + 1]] (эрэмбэлсэн, 0 < c < len(үг)),
+    # ids[k] нь k-р токены үгийн сан дахь дугаар. Сүүлийн хоосон муж нь санд байхгүй үгийнх.
+    __slots__ = ("index", "offsets", "cuts", "ids")
+
+    def __init__(self, vocab, cut_lists, words=None):
+        self.index = {w: v for v, w in enumerate(vocab)}
+        self.offsets, self.cuts = array('I', [0]), array('I')
+        for w, cuts in zip(vocab, cut_lists):
+            self.cuts.extend(sorted({c for c in cuts if 0 < c < len(w)}))
+            self.offsets.append(len(self.cuts))
+        self.offsets.append(len(self.cuts))
+        self.ids = self._ids(vocab if words is None else words)
+
+    def _ids(self, words):
+        missing = len(self.index)
+        return array('I', [self.index.get(w, missing) for w in words])
+
+    def __len__(self):
+        return len(self.ids)
+
+    def positions(self, k):
+        v = self.ids[k]
+        return self.cuts[self.offsets[v]:self.offsets[v + 1]]
+
+    def hyphenate(self, word):
+        v = self.index.get(word, len(self.index))
+        return list(self.cuts[self.offsets[v]:self.offsets[v + 1]])
+
+    def hyphenate_many(self, words):
+        # Ижил үгийн сан дээрх шинэ токены дараалал: массивуудыг хуваалцаж зөвхөн ids-ийг үүсгэнэ
+        table = object.__new__(HyphenTable)
+        table.index, table.offsets, table.cuts = self.index, self.offsets, self.cuts
+        table.ids = self._ids(words)
+        return table
+
+
+def hyphen_table(words, hyph):
+    # Бусад hyphenator-т ялгаатай үг бүрээр hyphenate() дуудна
+    if isinstance(hyph, (MultiLangHyphenator, HyphenTable)):
+        return hyph.hyphenate_many(words)
+    vocab = list(dict.fromkeys(words))
+    return HyphenTable(vocab, [hyph.hyphenate(w) for w in vocab], words)
+
 
 def split_words(text):
     return [w for w in text.split() if w]
 
 
-def greedy_justify_with_hyphenation(words, width, hyph):
+def greedy_justify_with_hyphenation(words, width, hyph, table=None):
+    # table (HyphenTable) өгвөл hyphenator руу дахин хандахгүй
     result, line_words, current_len = [], [], 0
-    for w in words:
+    for k, w in enumerate(words):
         if current_len + len(w) + len(line_words) <= width:
             line_words.append(w)
             current_len += len(w)
         else:
-            cuts = hyph.hyphenate(w)
+            cuts = table.positions(k) if table is not None else hyph.hyphenate(w)
             placed = False
             for c in reversed(cuts):
                 left, right = w[:c] + "-", w[c:]
@@ -60,61 +679,140 @@ def greedy_justify_with_hyphenation(words, width, hyph):
                     line_words, current_len, placed = [right], len(right), True
                     break
             if not placed:
-                result.append(justify_line(line_words, width))
+                if line_words:
+                    result.append(justify_line(line_words, width))
                 line_words, current_len = [w], len(w)
     if line_words:
         result.append(justify_line(line_words, width))
     return result
 
 
-def greedy_break(words, width):
-    lines, i = [], 0
-    while i < len(words):
-        line, length = [], 0
-        while i < len(words):
-            w = words[i]
-            if not line:
-                line.append(w)
-                length = len(w)
-                i += 1
-                if length > width:
-                    break
-            elif length + 1 + len(w) <= width:
-                length += 1 + len(w)
-                line.append(w)
-                i += 1
-            else:
-                break
-        lines.append(line)
-    return lines
+class LineMetrics:
+    # Үгсийн уртын prefix нийлбэр: words[i:j]-г нэг зайтай нийлүүлсэн урт O(1)
+    def __init__(self, words, lengths=None):
+        self.words = words
+        if lengths is None:
+            lengths = (len(w) for w in words)
+        self.prefix = [0] + list(itertools.accumulate(lengths))
+
+    def __len__(self):
+        return len(self.words)
+
+    def word_len(self, i):
+        return self.prefix[i + 1] - self.prefix[i]
+
+    def length(self, i, j):
+        return self.prefix[j] - self.prefix[i] + j - i - 1
+
+
+class BreakLayout:
+    # Мөрүүдийг list[list[str]] биш, words руу заасан таслалтын индексээр хадгална:
+    # ends[k] = k-р мөрийн төгсгөлийн үгийн индекс. Мөр тасалсан үгээр дуусвал
+    # hyphens битмапын k-р бит асаж, таслах тэмдэгтийн байрлал нь cuts-д дарааллаараа байна.
+    # Мөрүүдийг зөвхөн давтах/индексээр авах үед үүсгэнэ.
+    __slots__ = ("words", "ends", "cuts", "hyphens")
+
+    def __init__(self, words, ends=None, cuts=None, hyphens=None):
+        self.words = words
+        self.ends = ends if ends is not None else array("I")
+        self.cuts = cuts if cuts is not None else array("I")
+        self.hyphens = hyphens if hyphens is not None else bytearray()
+
+    def append(self, end, cut=0):
+        k = len(self.ends)
+        self.ends.append(end)
+        if k % 8 == 0:
+            self.hyphens.append(0)
+        if cut:
+            self.hyphens[k >> 3] |= 1 << (k & 7)
+            self.cuts.append(cut)
+
+    def hyphenated(self, k):
+        return bool(self.hyphens[k >> 3] >> (k & 7) & 1)
+
+    def __len__(self):
+        return len(self.ends)
+
+    def _line(self, k0, c0, k, c):
+        words = self.words
+        if k0 == k:
+            return [words[k0][c0:c] + "-"]
+        line = words[k0:k]
+        if c0:
+            line[0] = words[k0][c0:]
+        if c:
+            line.append(words[k][:c] + "-")
+        return line
+
+    def __iter__(self):
+        k0 = c0 = r = 0
+        for k, end in enumerate(self.ends):
+            c = 0
+            if self.hyphens[k >> 3] >> (k & 7) & 1:
+                c, r = self.cuts[r], r + 1
+            yield self._line(k0, c0, end, c)
+            k0, c0 = end, c
+
+    def __getitem__(self, k):
+        if k < 0:
+            k += len(self.ends)
+        if not 0 <= k < len(self.ends):
+            raise IndexError(k)
+        # r = k-аас өмнөх тасалсан мөрийн тоо (битмап дээрх rank)
+        r = int.from_bytes(self.hyphens[:k >> 3], "little").bit_count()
+        r += (self.hyphens[k >> 3] & ((1 << (k & 7)) - 1)).bit_count()
+        k0, c0 = (self.ends[k - 1], self.cuts[r - 1] if self.hyphenated(k - 1) else 0) if k else (0, 0)
+        c = self.cuts[r] if self.hyphenated(k) else 0
+        return self._line(k0, c0, self.ends[k], c)
+
+
+def split_at(words, ends, compact):
+    # Таслалгүй мөрийн төгсгөлүүдээс BreakLayout эсвэл өмнөх шиг list[list[str]] буцаана
+    if compact:
+        return BreakLayout(words, ends, hyphens=bytearray((len(ends) + 7) >> 3))
+    return [words[i:j] for i, j in zip(itertools.chain((0,), ends), ends)]
+
+
+def greedy_break(words, width, metrics=None, compact=False):
+    P = (metrics or LineMetrics(words)).prefix
+    n = len(words)
+    ends, i = array("I"), 0
+    while i < n:
+        j = i + 1
+        if P[j] - P[i] <= width:
+            while j < n and P[j + 1] - P[i] + j - i <= width:
+                j += 1
+        ends.append(j)
+        i = j
+    return split_at(words, ends, compact)
 
 
-def dp_justify_with_hyphenation(text, width):
-    words = text.split()
+def dp_justify_with_hyphenation(text, width, metrics=None):
+    words = text.split() if isinstance(text, str) else text
     n = len(words)
-
-    def badness(i, j):
-        line_words = words[i:j]
-        total_chars = sum(len(w) for w in line_words)
-        spaces = j - i - 1
-        length = total_chars + spaces
-        if length > width:
-            return math.inf
-        return (width - length) ** 2
+    P = (metrics or LineMetrics(words)).prefix
 
     dp = [math.inf] * (n + 1)
     nxt = [0] * (n + 1)
     dp[n] = 0
+    steps = 0  # дотоод давталтын тоо (instrumentation-д)
 
     for i in range(n - 1, -1, -1):
+        best, best_j = math.inf, 0
         for j in range(i + 1, n + 1):
-            cost = badness(i, j)
-            if cost == math.inf:
+            length = P[j] - P[i] + j - i - 1
+            if length > width:
+                if j == i + 1:
+                    best, best_j = dp[j], j  # хэт урт үг дангаараа мөр болно
                 break
-            if dp[j] + cost < dp[i]:
-                dp[i] = dp[j] + cost
-                nxt[i] = j
-
+            cost = dp[j] + (width - length) ** 2
+            if cost < best:
+                best, best_j = cost, j
+        dp[i], nxt[i] = best, best_j
+        steps += j - i
+
+    if instrumentation is not None:
+        instrumentation.count_states("dp_justify_with_hyphenation", steps)
     lines, i = [], 0
     while i < n:
         j = nxt[i]
@@ -123,17 +821,19 @@ def dp_justify_with_hyphenation(text, width):
     return lines
 
 
-def dp_break(words, width):
+def dp_break(words, width, metrics=None, compact=False):
     n = len(words)
+    P = (metrics or LineMetrics(words)).prefix
     INF = float('inf')
     dp = [INF] * (n + 1)
     next_idx = [-1] * (n + 1)
     dp[n] = 0
+    steps = 0
 
     for i in range(n - 1, -1, -1):
-        best, best_j, length = INF, -1, 0
+        best, best_j = INF, -1
         for j in range(i, n):
-            length = len(words[j]) if j == i else length + 1 + len(words[j])
+            length = P[j + 1] - P[i] + j - i
             if j == i and length > width:
                 if dp[j + 1] != INF and dp[j + 1] < best:
                     best, best_j = dp[j + 1], j + 1
@@ -144,100 +844,290 @@ def dp_break(words, width):
             if dp[j + 1] != INF and dp[j + 1] + cost < best:
                 best, best_j = dp[j + 1] + cost, j + 1
         dp[i], next_idx[i] = best, best_j
+        steps += j - i + 1
 
-    lines, i = [], 0
+    if instrumentation is not None:
+        instrumentation.count_states("dp_break", steps)
+    ends, i = array("I"), 0
     while i < n:
         j = next_idx[i]
         if j <= i or j == -1:
-            lines.extend(greedy_break(words[i:], width))
+            ends.extend(i + end for end in greedy_break(words[i:], width, compact=True).ends)
             break
-        lines.append(words[i:j])
+        ends.append(j)
         i = j
-    return lines
+    return split_at(words, ends, compact)
 
 
-def dp_with_hyphenation(words, width, hyph):
+def fast_dp_break(words, width, metrics=None, compact=False):
+    # dp_break-тэй яг ижил layout, гэхдээ O(n log n).
+    # (width - length)^3 нь хотгор биш (convex) тул шийдвэрийн монотон чанар
+    # хадгалагдана: мөрүүдийг төгсгөлөөс нь тоолж, нэр дэвшигчдийг deque-д
+    # хадгалан, хэзээ нөгөөгөө давахыг binary search-ээр олно.
     n = len(words)
+    if n == 0:
+        return split_at(words, array("I"), compact)
     INF = float('inf')
-    dp = [INF] * (n + 1)
-    next_idx = [-1] * (n + 1)
-    line_contents = [None] * (n + 1)
-    dp[n] = 0
+    P = (metrics or LineMetrics(words)).prefix
 
-    for i in range(n - 1, -1, -1):
-        best_cost, best_j, best_line = INF, -1, None
+    # T[x] = сүүлийн x үгийн (урт + 1)-ийн нийлбэр; мөр words[n-b:n-a]-ийн урт T[b]-T[a]-1
+    T = [P[n] - P[n - x] + x for x in range(n + 1)]
 
-        for j in range(i + 1, n + 1):
-            line_words, current_len, valid_line = [], 0, True
-            for k in range(i, j):
-                word = words[k]
-                if current_len + len(word) + (1 if line_words else 0) > width:
-                    cuts = hyph.hyphenate(word)
-                    hyphen_used = False
-                    for c in reversed(cuts):
-                        left_part, right_part = word[:c] + "-", word[c:]
-                        if current_len + len(left_part) + (1 if line_words else 0) <= width:
-                            line_words.append(left_part)
-                            words.insert(k + 1, right_part)
-                            n += 1
-                            dp.append(INF)
-                            next_idx.append(-1)
-                            line_contents.append(None)
-                            hyphen_used = True
-                            break
-                    if not hyphen_used:
-                        valid_line = False
-                        break
-                else:
-                    line_words.append(word)
-                    current_len += len(word) + (1 if line_words else 0) - (0 if len(line_words) == 1 else 1)
+    E = [0] * (n + 1)  # E[b] == dp_break-ийн dp[n - b]
 
-            if not valid_line:
-                break
+    def f(a, b):
+        length = T[b] - T[a] - 1
+        if length > width:
+            return INF
+        return E[a] + (width - length) ** 3
+
+    cand, start, head = [0], [1], 0
+    steps = n  # дотоод давталт: b бүрд нэг + шахалт + binary search-ийн алхам
+    for b in range(1, n + 1):
+        while head + 1 < len(cand) and start[head + 1] <= b:
+            head += 1
+        if T[b] - 1 <= width:
+            E[b] = 0  # сүүлийн мөр үнэгүй
+        elif P[n - b + 1] - P[n - b] > width:
+            E[b] = E[b - 1]  # хэт урт үг дангаараа мөр болно
+        else:
+            E[b] = f(cand[head], b)
 
-            line_length = sum(len(w) for w in line_words) + max(0, len(line_words) - 1)
-            if line_length > width:
+        if b == n:
+            break
+        start[head] = b + 1
+        while len(cand) > head and f(b, start[-1]) <= f(cand[-1], start[-1]):
+            cand.pop()
+            start.pop()
+            steps += 1
+        if len(cand) == head:
+            cand.append(b)
+            start.append(b + 1)
+            continue
+        a = cand[-1]
+        lo = start[-1]
+        # a-аас эхлэх мөр багтахгүй болох эхний b-ээс хойш шинэ нэр дэвшигч заавал давна
+        hi = min(bisect.bisect_right(T, T[a] + 1 + width), n + 1)
+        while lo + 1 < hi:
+            steps += 1
+            mid = (lo + hi) // 2
+            if f(b, mid) <= f(a, mid):
+                hi = mid
+            else:
+                lo = mid
+        if hi <= n:
+            cand.append(b)
+            start.append(hi)
+
+    if instrumentation is not None:
+        instrumentation.count_states("fast_dp_break", steps)
+    ends, i = array("I"), 0
+    while i < n:
+        j, length = i + 1, P[i + 1] - P[i]
+        if length <= width:
+            target = E[n - i]
+            while (0 if j == n else (width - length) ** 3) + E[n - j] != target:
+                j += 1
+                length = P[j] - P[i] + j - i - 1
+        ends.append(j)
+        i = j
+    return split_at(words, ends, compact)
+
+
+HYPHEN_PENALTY = 100
+
+
+def dp_with_hyphenation(words, width, hyph, hyphen_penalty=HYPHEN_PENALTY, metrics=None, compact=False,
+                        table=None):
+    # Таслах цэгийн граф дээрх DP. Цэг (k, c) нь k-р үгийн c-р тэмдэгтийн өмнө
+    # (c == 0 бол үгсийн хооронд). Мөр бүр дор хаяж нэг тэмдэгт нэмдэг тул цэг бүрээс
+    # width + 1-ээс ихгүй ирмэг гарна: O((n + h) * width), h = нийт таслах цэгийн тоо.
+    # words-г өөрчлөхгүй; таслалтыг HyphenTable-ээс уншина (ялгаатай үг бүрийг нэг удаа).
+    n = len(words)
+    if n == 0:
+        return BreakLayout(words) if compact else []
+    P = (metrics or LineMetrics(words)).prefix
+    table = table if table is not None else hyphen_table(words, hyph)
+    offsets, cuts, points = table.offsets, table.cuts, []
+    for k, v in enumerate(table.ids):
+        points.append((k, 0))
+        points.extend((k, c) for c in cuts[offsets[v]:offsets[v + 1]])
+    points.append((n, 0))
+
+    m = len(points)
+    INF = float('inf')
+    best = [INF] * m
+    nxt = [m - 1] * m
+    best[m - 1] = 0
+    steps = 0
+    for a in range(m - 2, -1, -1):
+        k1, c1 = points[a]
+        for b in range(a + 1, m):
+            k2, c2 = points[b]
+            pieces = k2 - k1 + (c2 > 0)
+            length = P[k2] - P[k1] - c1 + c2 + (c2 > 0) + pieces - 1
+            if length > width:
+                if b == a + 1 and best[b] < best[a]:
+                    best[a], nxt[a] = best[b], b  # хэт урт хэсэг дангаараа мөр болно
                 break
+            cost = 0 if b == m - 1 else (width - length) ** 3 + (hyphen_penalty if c2 else 0)
+            if best[b] + cost < best[a]:
+                best[a], nxt[a] = best[b] + cost, b
+        steps += b - a
+
+    if instrumentation is not None:
+        instrumentation.count_states("dp_with_hyphenation", steps)
+    layout, a = BreakLayout(words), 0
+    while a < m - 1:
+        a = nxt[a]
+        layout.append(*points[a])
+    return layout if compact else list(layout)
+
+
+class WindowedBreaker:
+    # Урсгал optimal-fit (dp_break-ийн өртөг, сүүлийн мөр үнэгүй). Урагшаа DP:
+    # f[j] = words[:j]-ийг мөрүүдэд хуваах хамгийн бага өртөг, pred[j] = сүүлийн таслал.
+    # Ирээдүйн мөр зөвхөн "нээлттэй" төлвөөс (үг нэмж болох мөрийн эхлэл) эхэлнэ, тэдгээрийн
+    # pred гинж бүгд нийлдэг цэг хүртэлх мөрүүд аль ч шийдэлд ижил тул шууд гаргана.
+    # Буфер window үгэнд хүрвэл хамгийн бага өртөгтэй нээлттэй төлөв хүртэл хүчээр гаргана:
+    # санах ой O(window), эхний мөр хамгийн ихдээ window үгийн дараа гарна.
+    def __init__(self, width, window=2000, check_every=16):
+        self.width = width
+        self.window = max(window, 2)
+        self.check_every, self.unchecked = check_every, 0
+        self.words, self.P, self.f, self.pred = [], [0], [0], [-1]
+
+    def _extend(self, word):
+        words, P, f, width = self.words, self.P, self.f, self.width
+        words.append(word)
+        P.append(P[-1] + len(word))
+        j = len(words)
+        i = j - 1
+        best, arg = f[i], i  # хэт урт үг дангаараа мөр болно
+        if P[j] - P[i] <= width:
+            best = math.inf
+            while i >= 0:
+                length = P[j] - P[i] + j - i - 1
+                if length > width:
+                    break
+                cost = f[i] + (width - length) ** 3
+                if cost < best:
+                    best, arg = cost, i
+                i -= 1
+            if instrumentation is not None:
+                instrumentation.count_states("WindowedBreaker.push", j - max(i, 0))
+        f.append(best)
+        self.pred.append(arg)
+
+    def _open_states(self):
+        # Дараагийн үгийг хүлээн авч чадах мөрийн эхлэлүүд, мөн j өөрөө
+        P, j, width = self.P, len(self.words), self.width
+        states, i = [j], j - 1
+        while i >= 0 and P[j] - P[i] + j - i - 1 + 2 <= width:
+            states.append(i)
+            i -= 1
+        return states
+
+    def _meet(self, states):
+        # pred модонд states-ийн хамгийн ойрын нийтлэг өвөг
+        pred, members = self.pred, set(states)
+        heap = [-s for s in members]
+        heapq.heapify(heap)
+        while len(members) > 1:
+            top = -heapq.heappop(heap)
+            members.discard(top)
+            if pred[top] not in members:
+                members.add(pred[top])
+                heapq.heappush(heap, -pred[top])
+        return members.pop()
+
+    def _emit(self, c):
+        # words[:c]-ийн мөрүүдийг гаргаж, c-ээс эхлэн DP-г дахин бодно
+        breaks = []
+        while c > 0:
+            breaks.append(c)
+            c = self.pred[c]
+        lines, start = [], 0
+        for end in reversed(breaks):
+            lines.append(self.words[start:end])
+            start = end
+        rest = self.words[start:]
+        self.words, self.P, self.f, self.pred = [], [0], [0], [-1]
+        for word in rest:
+            self._extend(word)
+        return lines
+
+    def push(self, word):
+        self._extend(word)
+        self.unchecked += 1
+        if self.unchecked < self.check_every and len(self.words) < self.window:
+            return []
+        self.unchecked = 0
+        states = self._open_states()
+        c = self._meet(states)
+        if c == 0 and len(self.words) >= self.window:
+            c = -min((self.f[i], -i) for i in states if i > 0)[1]
+        return self._emit(c) if c > 0 else []
+
+    def finish(self):
+        words, P, f, j = self.words, self.P, self.f, len(self.words)
+        if j == 0:
+            return []
+        best, arg, i = f[j - 1], j - 1, j - 2
+        while i >= 0 and P[j] - P[i] + j - i - 1 <= self.width:
+            if f[i] <= best:
+                best, arg = f[i], i
+            i -= 1
+        lines = self._emit(arg)
+        lines.append(self.words)
+        self.words, self.P, self.f, self.pred = [], [0], [0], [-1]
+        return lines
 
-            cost = 0 if j == n else (width - line_length) ** 3
-            if dp[j] != INF and dp[j] + cost < best_cost:
-                best_cost, best_j, best_line = dp[j] + cost, j, line_words
 
-        if best_j != -1:
-            dp[i], next_idx[i], line_contents[i] = best_cost, best_j, best_line
+def window_dp_break(words, width, window=2000):
+    # words нь дурын iterable байж болно; мөрүүдийг боломжтой болмогц гаргана
+    breaker = WindowedBreaker(width, window)
+    for word in words:
+        yield from breaker.push(word)
+    yield from breaker.finish()
 
-    lines, i = [], 0
-    while i < n:
-        j = next_idx[i]
-        if j <= i or j == -1:
-            remaining = words[i:]
-            greedy_result = greedy_justify_with_hyphenation(remaining, width, hyph)
-            lines.extend([[w] if isinstance(w, str) else w for w in greedy_result])
-            break
-        if line_contents[i] is not None:
-            lines.append(line_contents[i])
-        i = j
-    return lines
+
+def layout_cost(lines, width):
+    # dp_break-ийн өртөг: сүүлийнхээс бусад мөрийн (width - урт)^3, хэт урт мөр 0
+    return sum(max(width - len(" ".join(line)), 0) ** 3 for line in lines[:-1])
 
 
 # ==================== FORMATTING ====================
 
+SPACES = [" " * i for i in range(257)]
+
+
+def spaces(n):
+    if n <= 0:
+        return ""
+    return SPACES[n] if n <= 256 else " " * n
+
+
+def join_gaps(words, base, extra):
+    # Эхний extra завсар base + 1, бусад нь base зайтай мөрийг нэг дамжилтаар угсарна
+    if extra == 0:
+        return spaces(base).join(words)
+    return spaces(base).join([spaces(base + 1).join(words[:extra + 1]), *words[extra + 1:]])
+
+
+def pad_center(text, width):
+    padding = (width - len(text)) // 2
+    return spaces(padding) + text + spaces(width - max(padding, 0) - len(text))
+
+
 def justify_line(words, width):
     if len(words) == 1:
         return words[0].ljust(width)
-    total_chars = sum(len(w) for w in words)
-    spaces_needed = width - total_chars
     gaps = len(words) - 1
     if gaps <= 0:
         return words[0].ljust(width)
-
-    base, extra = spaces_needed // gaps, spaces_needed % gaps
-    line = ""
-    for i, w in enumerate(words):
-        line += w
-        if i < gaps:
-            line += " " * (base + (1 if i < extra else 0))
-    return line
+    base, extra = divmod(width - sum(map(len, words)), gaps)
+    return join_gaps(words, base, extra)
 
 
 def left_align(lines, width):
@@ -250,60 +1140,919 @@ def right_align(lines, width):
 
 def full_justify(lines, width):
     result = []
+    last = len(lines) - 1
     for idx, line_words in enumerate(lines):
-        is_last = (idx == len(lines) - 1)
         if not line_words:
-            result.append(" " * width)
-            continue
-        if len(line_words) == 1 or is_last:
-            line = " ".join(line_words)
-            result.append(line.ljust(width))
-            continue
-
-        words_len = sum(len(w) for w in line_words)
-        total_spaces = width - words_len
-        gaps = len(line_words) - 1
-        base, extra = total_spaces // gaps, total_spaces % gaps
-        line = ""
-        for i, w in enumerate(line_words):
-            line += w
-            if i < gaps:
-                line += " " * (base + (1 if i < extra else 0))
-        result.append(line)
+            result.append(spaces(width))
+        elif len(line_words) == 1 or idx == last:
+            result.append(" ".join(line_words).ljust(width))
+        else:
+            result.append(justify_line(line_words, width))
     return result
 
 
 def center_align(lines, width):
-    result = []
-    for line_words in lines:
-        line = " ".join(line_words)
-        padding = (width - len(line)) // 2
-        result.append((" " * padding + line).ljust(width))
-    return result
+    return [pad_center(" ".join(line_words), width) for line_words in lines]
 
 
 def format_by_type(lines, just_type, width, use_hyphenation=False, hyph=None):
+    if not (use_hyphenation and hyph):
+        return [left_align, right_align, center_align, full_justify][just_type - 1](lines, width)
+    if just_type == 4:
+        return [line if isinstance(line, str) else justify_line(line, width) for line in lines]
+    texts = (line if isinstance(line, str) else " ".join(line) for line in lines)
     if just_type == 1:
-        if use_hyphenation and hyph:
-            return [(line if isinstance(line, str) else " ".join(line)).ljust(width) for line in lines]
-        return left_align(lines, width)
+        return [text.ljust(width) for text in texts]
     if just_type == 2:
-        if use_hyphenation and hyph:
-            return [(line if isinstance(line, str) else " ".join(line)).rjust(width) for line in lines]
-        return right_align(lines, width)
-    if just_type == 3:
-        if use_hyphenation and hyph:
-            res = []
+        return [text.rjust(width) for text in texts]
+    return [pad_center(text, width) for text in texts]
+
+
+def justify_words(words, algo_choice, just_type, width, hyph=None, metrics=None, cache=None):
+    # 1) Greedy  2) Greedy+Hyphenation  3) DP  4) DP+Hyphenation
+    # Таслалтыг BreakLayout хэлбэрээр авч, мөрүүдийг форматлах үед л үүсгэнэ
+    if cache is not None:
+        return cache.justify(words, algo_choice, just_type, width, hyph, metrics)
+    return render_breaks(break_words(words, algo_choice, just_type, width, hyph, metrics),
+                         algo_choice, just_type, width, hyph)
+
+
+def break_words(words, algo_choice, just_type, width, hyph=None, metrics=None):
+    # Жигдлэлээс хамаарахгүй таслалт (BreakLayout). Greedy+Hyphen ба DP-ийн хоёр талд
+    # жигдлэл нь өөр алгоритм тул тэр хоёр тохиолдолд бэлэн мөрүүдийг (str) буцаана.
+    if algo_choice in (1, 2):
+        if algo_choice == 2 and just_type == 4:
+            # Үг бүрийн хэлийг дахин тодорхойлохгүйн тулд баримтыг нэг дор таслана
+            table = hyphen_table(words, hyph) if hyph is not None else None
+            return greedy_justify_with_hyphenation(words, width, hyph, table)
+        return greedy_break(words, width, metrics, compact=True)
+    if algo_choice == 3:
+        if just_type == 4:
+            return dp_justify_with_hyphenation(words, width, metrics)
+        return fast_dp_break(words, width, metrics, compact=True)
+    return dp_with_hyphenation(words, width, hyph, metrics=metrics, compact=True)
+
+
+def render_breaks(layout, algo_choice, just_type, width, hyph=None):
+    if isinstance(layout, list):
+        return list(layout)
+    return format_by_type(layout, just_type, width, algo_choice in (2, 4), hyph)
+
+
+class LayoutCache:
+    # Догол мөрийн агуулгын hash + өргөн + алгоритмаар таслалтыг (BreakLayout) хадгална:
+    # жигдлэлийн төрлийг солих эсвэл давтагдсан догол мөр зөвхөн форматлах зардалтай.
+    # Hyphenation-тай алгоритмд нэг кэшийг нэг hyphenator-тай хэрэглэнэ.
+    def __init__(self, maxsize=1024):
+        self.cache = LRUCache(maxsize)
+
+    @staticmethod
+    def key(words, algo_choice, just_type, width):
+        import hashlib
+        if isinstance(words, SpanWords) and len(words):
+            # mmap-ийн байтын мужийг decode хийлгүй шууд hash хийнэ (зай/мөр шилжилт ялгаатай бол
+            # өөр түлхүүр болох ч зөвхөн кэшийн алдалт)
+            text = words.text
+            end = text.starts[words.hi - 1] + text.sizes[words.hi - 1]
+            with memoryview(text.buf) as view:
+                digest = hashlib.blake2b(view[text.starts[words.lo]:end], digest_size=16).digest()
+        else:
+            digest = hashlib.blake2b("\n".join(words).encode("utf-8"), digest_size=16).digest()
+        return digest, width, algo_choice, algo_choice in (2, 3) and just_type == 4
+
+    def justify(self, words, algo_choice, just_type, width, hyph=None, metrics=None):
+        key = self.key(words, algo_choice, just_type, width)
+        layout = self.cache.get(key)
+        if layout is None:
+            layout = break_words(words, algo_choice, just_type, width, hyph, metrics)
+            self.cache.put(key, layout)
+        return render_breaks(layout, algo_choice, just_type, width, hyph)
+
+    def clear(self):
+        self.cache.clear()
+
+    def __len__(self):
+        return len(self.cache)
+
+    def stats(self):
+        return self.cache.stats()
+
+
+def justify_widths(text, widths, algo_choice, just_type, hyph=None):
+    # Олон өргөнөөр нэг дор: үгэнд хуваах, prefix нийлбэр, таслалтыг нэг л удаа бодно.
+    # {өргөн: мөрүүд} буцаана; мөр бүр iter_justified-тэй ижил.
+    paragraphs = [(words, LineMetrics(words)) for words in iter_paragraphs(text.splitlines())]
+    if algo_choice in (2, 4) and hyph is not None:
+        # Нийт үгийн санг нэг удаа таслана; догол мөр бүр зөвхөн ids-ээ үүсгэнэ
+        hyph = hyphen_table([w for words, _ in paragraphs for w in words], hyph)
+    layouts = {}
+    for width in widths:
+        out = []
+        for words, metrics in paragraphs:
+            if out:
+                out.append("")
+            out.extend(justify_words(words, algo_choice, just_type, width, hyph, metrics))
+        layouts[width] = out
+    return layouts
+
+
+# ==================== STREAMING ====================
+
+def iter_paragraphs(lines):
+    # Хоосон мөрөөр тусгаарлагдсан догол мөр бүрийг үгсийн жагсаалтаар нь гаргана
+    words = []
+    for line in lines:
+        line_words = split_words(line)
+        if line_words:
+            words.extend(line_words)
+        elif words:
+            yield words
+            words = []
+    if words:
+        yield words
+
+
+def justify_paragraphs(paragraphs, algo_choice, just_type, width, hyph=None, cache=None):
+    # Догол мөр бүрийн мөрүүдийг гаргаж, догол мөрийн хооронд хоосон мөр ("") гаргана
+    first = True
+    for words in paragraphs:
+        if not first:
+            yield ""
+        first = False
+        yield from justify_words(words, algo_choice, just_type, width, hyph, cache=cache)
+
+
+def iter_justified(lines, algo_choice, just_type, width, hyph=None, cache=None):
+    return justify_paragraphs(iter_paragraphs(lines), algo_choice, just_type, width, hyph, cache)
+
+
+def stream_justify(src, dst, algo_choice, just_type, width, hyph=None, cache=None):
+    stats = {"paragraphs": 0, "words": 0, "lines": 0}
+    for words in iter_paragraphs(src):
+        if stats["paragraphs"]:
+            dst.write("\n")
+        out = justify_words(words, algo_choice, just_type, width, hyph, cache=cache)
+        dst.write("\n".join(out) + "\n")
+        dst.flush()
+        stats["paragraphs"] += 1
+        stats["words"] += len(words)
+        stats["lines"] += len(out)
+    return stats
+
+
+def format_window_lines(lines, just_type, width, final):
+    # Урсгалаар гарсан мөрүүд: хоёр талд жигдлэхэд зөвхөн догол мөрийн сүүлийн мөр зүүн тийш
+    if just_type != 4:
+        return format_by_type(lines, just_type, width)
+    if final:
+        return full_justify(lines, width)
+    return [justify_line(line, width) for line in lines]
+
+
+def stream_window_justify(src, dst, just_type, width, window=2000):
+    # Хэт урт догол мөрийг ч бүтнээр нь санах ойд хадгалахгүй: WindowedBreaker-ээр
+    # мөр бүрийг боломжтой болмогц бичнэ. Бүх төрөлд dp_break-ийн өртгийг ашиглана.
+    stats = {"paragraphs": 0, "words": 0, "lines": 0}
+    breaker = None
+
+    def write(lines, final=False):
+        if lines:
+            dst.write("\n".join(format_window_lines(lines, just_type, width, final)) + "\n")
+            stats["lines"] += len(lines)
+
+    for line in src:
+        line_words = split_words(line)
+        if not line_words:
+            if breaker is not None:
+                write(breaker.finish(), True)
+                dst.flush()
+                breaker = None
+            continue
+        if breaker is None:
+            if stats["paragraphs"]:
+                dst.write("\n")
+            breaker = WindowedBreaker(width, window)
+            stats["paragraphs"] += 1
+        stats["words"] += len(line_words)
+        for word in line_words:
+            write(breaker.push(word))
+    if breaker is not None:
+        write(breaker.finish(), True)
+    dst.flush()
+    return stats
+
+
+# ==================== MMAP TOKENIZER ====================
+
+# ASCII хоосон зай (str.split()-ийн \x1c-\x1f-ийг оруулаад) дээр л хуваана:
+# NBSP зэрэг Unicode зай үгийн дотор үлдэнэ. Хоосон зай бүрийг ' ' болгоод
+# bytes.split(b' ') хийвэл хэсэг бүр нэг үг эсвэл хоосон байна.
+SPACE_BYTES = b' \t\n\r\f\v\x1c\x1d\x1e\x1f'
+SPACE_TABLE = bytes.maketrans(SPACE_BYTES, b' ' * len(SPACE_BYTES))
+UTF8_CONTINUATION = bytes(range(0x80, 0xC0))
+PARAGRAPH_BREAK = re.compile(rb'\n[ \t\r\f\v\x1c-\x1f]*\n')
+
+
+class SpanWords:
+    # MappedText-ийн words[lo:hi] харагдац; үгийг зөвхөн уншихад нь decode хийнэ
+    __slots__ = ("text", "lo", "hi")
+
+    def __init__(self, text, lo, hi):
+        self.text, self.lo, self.hi = text, lo, hi
+
+    def __len__(self):
+        return self.hi - self.lo
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            i, j, step = key.indices(len(self))
+            if step != 1:
+                return [self[k] for k in range(i, j, step)]
+            return self.text.words(self.lo + i, self.lo + j)
+        if key < 0:
+            key += len(self)
+        if not 0 <= key < len(self):
+            raise IndexError(key)
+        return self.text.word(self.lo + key)
+
+    def __iter__(self):
+        for i in range(self.lo, self.hi, 1024):
+            yield from self.text.words(i, min(i + 1024, self.hi))
+
+    def metrics(self):
+        return LineMetrics(self, self.text.chars[self.lo:self.hi])
+
+
+class MappedText:
+    # Файлыг mmap хийж, UTF-8 байтан дээр нь үгэнд хуваана. Үг бүрт 16 байт:
+    # starts (байтын эхлэл), sizes (байтын урт), chars (тэмдэгтийн урт).
+    # len() нь read_text-ийн str-тэй адил: эхний үгээс сүүлчийн үг хүртэлх тэмдэгтийн тоо.
+    def __init__(self, path, block=1 << 22):
+        self.file = open(path, "rb")
+        size = os.fstat(self.file.fileno()).st_size
+        self.buf = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+        self.starts, self.sizes, self.chars = array("Q"), array("I"), array("I")
+        pos = continuation = 0
+        while pos < size:
+            end = min(pos + block, size)
+            while end < size and self.buf[end] not in SPACE_BYTES:
+                end += 1
+            chunk = self.buf[pos:end]
+            parts = chunk.translate(SPACE_TABLE).split(b' ')
+            # k-р хэсгийн эхлэл = pos + өмнөх хэсгүүдийн урт + k (тусгаарлагч)
+            offsets = map(operator.add, itertools.accumulate(map(len, parts), initial=pos), itertools.count())
+            self.starts.extend(itertools.compress(offsets, parts))
+            self.sizes.extend(map(len, filter(None, parts)))
+            # continuation байтуудыг хасвал үгийн байтын урт = тэмдэгтийн урт
+            stripped = chunk.translate(SPACE_TABLE, UTF8_CONTINUATION)
+            continuation += len(chunk) - len(stripped)
+            self.chars.extend(map(len, filter(None, stripped.split(b' '))))
+            pos = end
+        if len(self.chars) != len(self.starts):
+            self.close()
+            raise ValueError(f"{path}: UTF-8 биш байт агуулж байна")
+        breaks = [bisect.bisect_left(self.starts, m.start()) for m in PARAGRAPH_BREAK.finditer(self.buf)]
+        self.bounds = array("Q", [0, *breaks, len(self.starts)])
+        self.size = size
+        self.length = self.starts[-1] + self.sizes[-1] - self.starts[0] - continuation if self.starts else 0
+
+    def __len__(self):
+        return self.length
+
+    def span_words(self):
+        return SpanWords(self, 0, len(self.starts))
+
+    def word(self, k):
+        start = self.starts[k]
+        return self.buf[start:start + self.sizes[k]].decode("utf-8")
+
+    def words(self, i, j):
+        # words[i:j]-г нэг decode-оор: байтын мужийг бүтнээр нь decode хийгээд зайгаар хуваана
+        if i >= j:
+            return []
+        end = self.starts[j - 1] + self.sizes[j - 1]
+        line = self.buf[self.starts[i]:end].translate(SPACE_TABLE).decode("utf-8")
+        return list(filter(None, line.split(" ")))
+
+    def paragraphs(self):
+        for lo, hi in zip(self.bounds, self.bounds[1:]):
+            if hi > lo:
+                yield SpanWords(self, lo, hi)
+
+    def close(self):
+        if isinstance(self.buf, mmap.mmap):
+            self.buf.close()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# ==================== INCREMENTAL ====================
+
+class ParagraphLayout:
+    # Нэг догол мөрийн dp_break / greedy_break layout-ийг засвар бүрийн дараа хэсэгчлэн шинэчилнэ.
+    # Байрлал бүрд тэндээс эхлэх мөрийн үгийн тоо (nlen) болон DP-ийн үлдэгдэл өртгийн
+    # зөрүү gap[i] = dp[i] - dp[i + 1]-ийг хадгална: засвараас өмнөх бүх dp тогтмол c-ээр
+    # шилжихэд gap өөрчлөгдөхгүй тул угтварыг дахин бичих шаардлагагүй (dp[n] = 0).
+    # Мөрийн эхлэлийг үгтэй зэрэгцсэн bytearray-д тэмдэглэнэ: insert/delete нь зөвхөн memmove.
+    def __init__(self, words, width, algo="dp"):
+        self.words = list(words)
+        self.width = width
+        self.algo = algo
+        n = len(self.words)
+        self.nlen = [0] * n
+        self.gap = [0] * n
+        for i in range(n - 1, -1, -1):
+            self.gap[i], self.nlen[i] = self._solve(i)
+        self.is_start = bytearray(n)
+        for p in self._walk(0):
+            self.is_start[p] = 1
+        self.last_recomputed = n
+
+    def _walk(self, p):
+        nlen, n = self.nlen, len(self.words)
+        while p < n:
+            yield p
+            p += nlen[p]
+
+    @property
+    def starts(self):
+        return list(self._walk(0))
+
+    def _solve(self, i):
+        # i-р үгээс эхлэх мөр: (gap[i], мөрийн үгийн тоо); dp_break / greedy_break-тэй ижил дүрэм.
+        # Нэр дэвшигчийг dp[j + 1] - dp[i + 1] (rel)-ээр харьцуулна.
+        words, width, n = self.words, self.width, len(self.words)
+        length = len(words[i])
+        if self.algo == "greedy":
+            j = i + 1
+            if length <= width:
+                while j < n and length + 1 + len(words[j]) <= width:
+                    length += 1 + len(words[j])
+                    j += 1
+            return 0, j - i
+        if length > width:
+            return 0, 1
+        gap = self.gap
+        best, best_j, j, rel = float('inf'), i + 1, i, 0
+        while True:
+            cost = 0 if j == n - 1 else (width - length) ** 3
+            if rel + cost < best:
+                best, best_j = rel + cost, j + 1
+            j += 1
+            if j == n:
+                break
+            length += 1 + len(words[j])
+            if length > width:
+                break
+            rel -= gap[j]
+        return best, best_j - i
+
+    def _reach(self, i):
+        # i-ээс эхлэх мөрийн хамгийн хол төгсгөл (дараагийн мөрийн эхлэл)
+        words, width, n = self.words, self.width, len(self.words)
+        length, j = len(words[i]), i + 1
+        while j < n and length + 1 + len(words[j]) <= width:
+            length += 1 + len(words[j])
+            j += 1
+        return j
+
+    def insert(self, e, word):
+        return self._edit(e, "insert", word)
+
+    def delete(self, e):
+        return self._edit(e, "delete")
+
+    def replace(self, e, word):
+        return self._edit(e, "replace", word)
+
+    def _edit(self, e, op, word=None):
+        words, gap, nlen, is_start = self.words, self.gap, self.nlen, self.is_start
+        # change: шинэ dp[i] - хуучин dp[i] (i одоогийн байрлал)
+        if op == "insert":
+            words.insert(e, word)
+            nlen.insert(e, 0)
+            gap.insert(e, 0)  # хуучин утга нь dp[e + 1]-тэй тэнцүү
+            is_start.insert(e, 0)
+            keep = e + 1
+        elif op == "replace":
+            words[e] = word
+            keep = e + 1
+        else:
+            del words[e]
+            nlen.pop(e)
+            change = -gap.pop(e)
+            del is_start[e]
+            keep = e
+
+        # keep-ээс хойших байрлалууд өөрчлөгдөхгүй; түүнээс өмнөхийг доош нь дахин бодно
+        if self.algo == "greedy":
+            i = keep - 1
+            while i >= 0 and (i >= e or i + nlen[i] >= e):
+                nlen[i] = self._solve(i)[1]
+                i -= 1
+            lo = i + 1
+        else:
+            # i - 1-ийн бүх нэр дэвшигч хил дээр шинэ dp = хуучин dp + c болмогц түүнээс
+            # өмнөх сонголтууд өөрчлөгдөхгүй: тэдгээрийн gap ч хэвээр тул зогсоно.
+            if op == "delete":
+                c, same_top, i = change, e, e - 1
+            else:
+                change, c, same_top, i = 0, None, e, e
+            lo = 0
+            while i >= 0:
+                old = gap[i]
+                gap[i], nlen[i] = self._solve(i)
+                change += gap[i] - old
+                if change != c:
+                    c, same_top = change, i
+                # i - 1-ийн мөр хуучин, шинэ аль ч хувилбарт e-д хүрэхгүй байх ёстой
+                if i > 0 and self._reach(i - 1) <= min(same_top, e - 1):
+                    lo = i
+                    break
+                i -= 1
+
+        # Мөрийн эхлэлүүдийг lo-оос өмнөх мөрөөс дахин алхаж, хуучинтайгаа нийлэхэд зогсоно
+        # (keep-ээс хойших тэмдэглэгээ insert/delete-ээр аль хэдийн шилжсэн)
+        n = len(words)
+        p = first = max(is_start.rfind(1, 0, lo), 0)
+        new_part = []
+        while p < n:
+            if p >= keep and is_start[p]:
+                break
+            new_part.append(p)
+            p += nlen[p]
+        is_start[first:p] = bytes(p - first)
+        for s in new_part:
+            is_start[s] = 1
+        self.last_recomputed = keep - lo
+        return (new_part[0] if new_part else p), p
+
+    def lines(self):
+        words, nlen = self.words, self.nlen
+        return [words[s:s + nlen[s]] for s in self._walk(0)]
+
+
+class IncrementalLayout:
+    # Баримт бичгийг догол мөрөөр нь хадгалж, засвар орсон догол мөрийг л дахин жигдэлнэ.
+    # algo: "dp" (dp_break) эсвэл "greedy" (greedy_break)
+    def __init__(self, text, width, algo="dp"):
+        self.width = width
+        self.algo = algo
+        self.paragraphs = [ParagraphLayout(words, width, algo)
+                           for words in iter_paragraphs(text.splitlines())]
+
+    def insert_word(self, par, i, word):
+        return self.paragraphs[par].insert(i, word)
+
+    def delete_word(self, par, i):
+        return self.paragraphs[par].delete(i)
+
+    def replace_word(self, par, i, word):
+        return self.paragraphs[par].replace(i, word)
+
+    def insert_paragraph(self, par, text):
+        self.paragraphs.insert(par, ParagraphLayout(split_words(text), self.width, self.algo))
+
+    def delete_paragraph(self, par):
+        del self.paragraphs[par]
+
+    def lines(self):
+        return [p.lines() for p in self.paragraphs if p.words]
+
+    def format(self, just_type):
+        out = []
+        for lines in self.lines():
+            if out:
+                out.append("")
+            out.extend(format_by_type(lines, just_type, self.width))
+        return out
+
+
+# ==================== PARALLEL ====================
+
+_worker_hyph = None
+
+
+def _init_worker(engine, need_hyph, store=None):
+    # Процесс бүр hyphenator-аа (ба байнгын кэшийн холболтоо) нэг л удаа үүсгэнэ
+    global _worker_hyph
+    _worker_hyph = MultiLangHyphenator(engine=engine, store=store) if need_hyph else None
+
+
+def _hyphenate_chunk(vocab, hyph=None):
+    # Дуудагч тал байнгын кэшийг аль хэдийн шалгасан тул энд дахин хайхгүй
+    hyph = hyph or _worker_hyph
+    scripts = hyph.tag_words(vocab)
+    return [hyph._hyphenate(w, None, False, scripts[w]) for w in vocab]
+
+
+def _justify_shard(paragraphs, algo_choice, just_type, width):
+    lines = [justify_words(words, algo_choice, just_type, width, _worker_hyph) for words in paragraphs]
+    if _worker_hyph is not None:
+        _worker_hyph.flush_store()
+    return lines
+
+
+def iter_shards(paragraphs, shard_words=5_000):
+    # Догол мөрүүдийг ойролцоогоор shard_words үгтэй хэсгүүдэд бүлэглэнэ
+    shard, size = [], 0
+    for words in paragraphs:
+        shard.append(words)
+        size += len(words)
+        if size >= shard_words:
+            yield shard
+            shard, size = [], 0
+    if shard:
+        yield shard
+
+
+def make_pool(workers=None, engine="native", need_hyph=True, store=None):
+    # store: ажилчин бүрийн нээх байнгын кэшийн файлын зам
+    from concurrent.futures import ProcessPoolExecutor
+    if engine == "mapped" and need_hyph:
+        # Ажилчид зэрэг хөрвүүлэхгүйн тулд эцэг процесс урьдчилан хөрвүүлнэ
+        for path, _ in LANGUAGES.values():
+            if os.path.isfile(path):
+                compiled_dic(path)
+    workers = workers or os.cpu_count() or 1
+    pool = ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(engine, need_hyph, store))
+    pool.workers = workers  # parallel_justify хэдэн shard зэрэг илгээхээ үүгээр мэднэ
+    return pool
+
+
+def parallel_justify(paragraphs, algo_choice, just_type, width, workers=None,
+                     engine="native", shard_words=5_000, executor=None):
+    # justify_paragraphs-тэй ижил мөрүүдийг ижил дарааллаар гаргана.
+    # executor-ийг make_pool()-оор үүсгээд олон дуудлагад дахин ашиглаж болно.
+    workers = workers or getattr(executor, "workers", None) or os.cpu_count() or 1
+    need_hyph = algo_choice in (2, 4)
+    shards = iter_shards(paragraphs, shard_words)
+
+    def emit(results, first):
+        for lines in results:
+            if not first:
+                yield ""
+            first = False
+            yield from lines
+
+    first = True
+    if workers == 1 and executor is None:
+        hyph = MultiLangHyphenator(engine=engine) if need_hyph else None
+        for shard in shards:
+            yield from emit((justify_words(w, algo_choice, just_type, width, hyph) for w in shard), first)
+            first = False
+        return
+
+    ex = executor or make_pool(workers, engine, need_hyph)
+    try:
+        pending = deque()
+        for shard in shards:
+            pending.append(ex.submit(_justify_shard, shard, algo_choice, just_type, width))
+            if len(pending) >= 2 * workers:
+                yield from emit(pending.popleft().result(), first)
+                first = False
+        while pending:
+            yield from emit(pending.popleft().result(), first)
+            first = False
+    finally:
+        if executor is None:
+            ex.shutdown(cancel_futures=True)
+
+
+# ==================== INSTRUMENTATION ====================
+
+instrumentation = None
+
+
+class Instrumentation:
+    # Опц хэмжилт: enable() нь доорх үе шатуудыг хэмжигч wrapper-аар сольж,
+    # disable() буцааж сэргээнэ. Унтраалттай үед DP бүр нэг л None шалгалт хийнэ.
+    # Процессын pool-ийн ажилчид дотор хэмжихгүй.
+    STAGES = ("split_words", "classify_scripts", "greedy_break", "greedy_justify_with_hyphenation",
+              "dp_break", "fast_dp_break", "dp_justify_with_hyphenation", "dp_with_hyphenation",
+              "format_by_type")
+    # (үе шатын нэр, анги, method)
+    METHODS = (("hyphenate", "MultiLangHyphenator", "hyphenate"),
+               ("hyphenate_many", "MultiLangHyphenator", "hyphenate_many"),
+               ("WindowedBreaker.push", "WindowedBreaker", "push"),
+               ("WindowedBreaker.finish", "WindowedBreaker", "finish"))
+
+    def __init__(self):
+        self.calls, self.seconds, self.states = {}, {}, {}
+        self.originals = {}
+        self.lock = threading.Lock()
+
+    def _wrap(self, stage, fn):
+        @functools.wraps(fn)
+        def timed(*args, **kwargs):
+            t0 = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - t0
+                with self.lock:
+                    self.calls[stage] = self.calls.get(stage, 0) + 1
+                    self.seconds[stage] = self.seconds.get(stage, 0.0) + elapsed
+        return timed
+
+    def enable(self):
+        global instrumentation
+        if instrumentation is not None:
+            raise RuntimeError("хэмжилт аль хэдийн идэвхтэй байна")
+        module = globals()
+        for stage in self.STAGES:
+            self.originals[stage] = module[stage]
+            module[stage] = self._wrap(stage, module[stage])
+        for stage, cls, method in self.METHODS:
+            self.originals[stage] = getattr(module[cls], method)
+            setattr(module[cls], method, self._wrap(stage, self.originals[stage]))
+        instrumentation = self
+        return self
+
+    def disable(self):
+        global instrumentation
+        if instrumentation is not self:
+            return
+        module = globals()
+        for stage, cls, method in self.METHODS:
+            setattr(module[cls], method, self.originals.pop(stage))
+        module.update(self.originals)
+        self.originals.clear()
+        instrumentation = None
+
+    def count_states(self, stage, count):
+        with self.lock:
+            self.states[stage] = self.states.get(stage, 0) + count
+
+    def reset(self):
+        with self.lock:
+            self.calls.clear()
+            self.seconds.clear()
+            self.states.clear()
+
+    def snapshot(self):
+        with self.lock:
+            return {stage: {"calls": self.calls[stage], "seconds": self.seconds[stage],
+                            "dp_states": self.states.get(stage, 0)}
+                    for stage in self.calls}
+
+    def to_json(self):
+        return json.dumps(self.snapshot(), ensure_ascii=False, indent=2)
+
+    def to_prometheus(self, prefix="justify"):
+        snapshot = self.snapshot()
+        out = []
+        for key, metric, help_text in (("calls", "stage_calls_total", "Үе шатын дуудлагын тоо"),
+                                       ("seconds", "stage_seconds_total", "Үе шатад зарцуулсан нийт хугацаа"),
+                                       ("dp_states", "dp_states_total", "DP-ийн бодсон төлөвийн тоо")):
+            out.append(f"# HELP {prefix}_{metric} {help_text}")
+            out.append(f"# TYPE {prefix}_{metric} counter")
+            for stage, st in sorted(snapshot.items()):
+                if key != "dp_states" or st[key]:
+                    out.append(f'{prefix}_{metric}{{stage="{stage}"}} {st[key]}')
+        return "\n".join(out) + "\n"
+
+    def __enter__(self):
+        return self.enable()
+
+    def __exit__(self, *exc):
+        self.disable()
+
+
+# ==================== OUTPUT ====================
+
+class OutputWriter:
+    # Мөрүүдийг том хэсэг болгон цуглуулж, тусдаа thread дээр бичнэ: тооцоолол ба
+    # бичилт давхцана. target: "-" (stdout), "*.gz" (gzip), файлын зам эсвэл file объект.
+    # Оролт хүлээж байх үед ч flush_interval-ийн дараа бичигч thread үлдсэнийг өөрөө бичнэ.
+    def __init__(self, target="-", buffer_size=1 << 18, flush_interval=0.1, max_pending=8):
+        self.owned = isinstance(target, str) and target != "-"
+        if not isinstance(target, str):
+            self.out = target
+        elif target == "-":
+            self.out = sys.stdout
+        elif target.endswith(".gz"):
+            self.out = gzip.open(target, "wt", encoding="utf-8")
+        else:
+            self.out = open(target, "w", encoding="utf-8")
+        self.buffer_size, self.flush_interval = buffer_size, flush_interval
+        self.parts, self.size = [], 0
+        self.last_push = time.perf_counter()
+        self.chars, self.io_seconds = 0, 0.0
+        self.error, self.reported = None, False
+        self.lock = threading.Lock()  # parts/size; queue.put-ийг ч түгжээтэй хийнэ (дараалал)
+        self.queue = queue.Queue(max_pending)  # дүүрвэл тооцоолол бичилтийг хүлээнэ
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        while True:
+            try:
+                chunk = self.queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                chunk = self._idle_chunk()
+                if not chunk:
+                    continue
+            if chunk is None:
+                break
+            if self.error is not None:
+                continue
+            t0 = time.perf_counter()
+            try:
+                self.out.write(chunk)
+                self.out.flush()
+            except Exception as e:
+                self.error = e
+            self.io_seconds += time.perf_counter() - t0
+
+    def _raise(self):
+        if self.error is not None and not self.reported:
+            self.reported = True
+            raise self.error
+
+    def _take(self):
+        chunk = "".join(self.parts)
+        self.chars += self.size
+        self.parts, self.size = [], 0
+        self.last_push = time.perf_counter()
+        return chunk
+
+    def _idle_chunk(self):
+        # Бичигч thread: дараалал хоосон, тооцоолол шинэ хэсэг өгөөгүй бол хүлээгдэж буйг авна.
+        # Түгжээг хүлээхгүй: эзэмшиж байвал тооцоолол өөрөө _push хийж байна.
+        if not self.lock.acquire(blocking=False):
+            return ""
+        try:
+            if self.parts and self.queue.empty():
+                return self._take()
+            return ""
+        finally:
+            self.lock.release()
+
+    def _push(self):
+        self._raise()
+        with self.lock:
+            if self.parts:
+                self.queue.put(self._take())
+            else:
+                self.last_push = time.perf_counter()
+
+    def write(self, text):
+        with self.lock:
+            self.parts.append(text)
+            self.size += len(text)
+            full = self.size >= self.buffer_size
+        if full:
+            self._push()
+
+    def write_lines(self, lines):
+        with self.lock:
             for line in lines:
-                text = line if isinstance(line, str) else " ".join(line)
-                padding = (width - len(text)) // 2
-                res.append((" " * padding + text).ljust(width))
-            return res
-        return center_align(lines, width)
-    # just_type == 4
-    if use_hyphenation and hyph:
-        return [line if isinstance(line, str) else justify_line(line, width) for line in lines]
-    return full_justify(lines, width)
+                self.parts.append(line)
+                self.parts.append("\n")
+                self.size += len(line) + 1
+            full = self.size >= self.buffer_size
+        if full:
+            self._push()
+
+    def flush(self):
+        # Мөр бүрт биш: flush_interval тутамд л бичигч thread руу өгнө
+        if time.perf_counter() - self.last_push >= self.flush_interval:
+            self._push()
+
+    def close(self):
+        if self.thread is None:
+            return
+        try:
+            self._push()
+        finally:
+            self.queue.put(None)
+            self.thread.join()
+            self.thread = None
+            try:
+                if self.owned:
+                    self.out.close()
+            except Exception as e:
+                self.error = self.error or e
+        self._raise()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# ==================== PROFILING ====================
+
+ALGORITHM_NAMES = ["Greedy", "Greedy+Hyphen", "DP", "DP+Hyphen"]
+
+
+def percentile(samples, q):
+    ordered = sorted(samples)
+    return ordered[max(0, math.ceil(q / 100 * len(ordered)) - 1)]
+
+
+def layout_quality(lines, width):
+    # Форматласан мөрүүдийн чанар. Догол мөрийн сүүлийн мөрөөс бусад мөр бүрийн дутуу
+    # зай g-ээр: raggedness = Σ g², cost = Σ g³ (dp_break-ийн өртөг)
+    ragged = cost = hyphens = count = 0
+    for k, line in enumerate(lines):
+        if not line:
+            continue
+        text = " ".join(line.split())
+        count += 1
+        hyphens += text.endswith("-")
+        if k + 1 < len(lines) and lines[k + 1]:
+            gap = max(width - len(text), 0)
+            ragged += gap * gap
+            cost += gap ** 3
+    return {"lines": count, "hyphens": hyphens, "raggedness": ragged, "cost": cost}
+
+
+def peak_memory_kb(fn):
+    # fn()-ийн ажиллах үеийн tracemalloc оргил (өмнө нь хуваарилагдсанаас хойш)
+    import tracemalloc
+    started = not tracemalloc.is_tracing()
+    if started:
+        tracemalloc.start()
+    try:
+        base = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        fn()
+        return (tracemalloc.get_traced_memory()[1] - base) / 1024
+    finally:
+        if started:
+            tracemalloc.stop()
+
+
+def profile_algorithms(words, just_type, width, hyph=None, algos=(1, 2, 3, 4), trials=5, warmup=1,
+                       memory=True, isolate=False, metrics=None):
+    # Алгоритм бүрийг warmup + trials удаа ээлжлэн ажиллуулна; trial бүрт дарааллыг эргүүлж
+    # кэш/дулааны нөлөөг тэнцүүлнэ. tracemalloc хугацааг гажуудуулдаг тул санах ойг тусад нь
+    # нэг удаа хэмжинэ. isolate=True бол алгоритм бүр шинэ процесст (өөрийн heap, толь,
+    # кэштэй) ажиллана. ({algo: статистик}, {algo: мөрүүд}) буцаана.
+    if isolate:
+        return _profile_isolated(words, just_type, width, algos, trials, warmup, memory)
+    import statistics
+    metrics = metrics or LineMetrics(words)
+    run = lambda algo: justify_words(words, algo, just_type, width, hyph, metrics)
+    samples, results, order = {algo: [] for algo in algos}, {}, list(algos)
+    for trial in range(warmup + trials):
+        for algo in order:
+            t0 = time.perf_counter()
+            results[algo] = run(algo)
+            if trial >= warmup:
+                samples[algo].append((time.perf_counter() - t0) * 1000)
+        order = order[1:] + order[:1]
+    report = {}
+    for algo in algos:
+        ms = samples[algo] or [0.0]
+        report[algo] = {"name": ALGORITHM_NAMES[algo - 1], "trials": trials, "min_ms": min(ms),
+                        "median_ms": statistics.median(ms), "p95_ms": percentile(ms, 95),
+                        "peak_kb": peak_memory_kb(lambda: run(algo)) if memory else None,
+                        **layout_quality(results[algo], width)}
+    return report, results
+
+
+def _profile_isolated(words, just_type, width, algos, trials, warmup, memory):
+    import subprocess
+    here = os.path.dirname(os.path.abspath(__file__))
+    report, results = {}, {}
+    for algo in algos:
+        job = {"words": list(words), "type": just_type, "width": width, "algo": algo,
+               "trials": trials, "warmup": warmup, "memory": memory}
+        proc = subprocess.run([sys.executable, "-c", "import biydaalt2; biydaalt2._profile_child()"],
+                              input=json.dumps(job, ensure_ascii=False), capture_output=True, text=True,
+                              encoding="utf-8", cwd=here, env=dict(os.environ, PYTHONIOENCODING="utf-8"),
+                              check=True)
+        child = json.loads(proc.stdout)
+        report[algo], results[algo] = child["report"], child["lines"]
+    return report, results
+
+
+def _profile_child():
+    job = json.load(sys.stdin)
+    algo = job["algo"]
+    hyph = MultiLangHyphenator(engine="native") if algo in (2, 4) else None
+    report, results = profile_algorithms(job["words"], job["type"], job["width"], hyph, (algo,),
+                                         job["trials"], job["warmup"], job["memory"])
+    json.dump({"report": report[algo], "lines": results[algo]}, sys.stdout, ensure_ascii=False)
+
+
+def format_profile(report):
+    yield (f"{'Алгоритм':15} {'min':>11} {'median':>11} {'p95':>11} {'оргил':>10} "
+           f"{'мөр':>6} {'таслалт':>8} {'raggedness':>11}")
+    for st in report.values():
+        peak = f"{st['peak_kb']:.0f} KB" if st["peak_kb"] is not None else "-"
+        yield (f"{st['name']:15} {format_ms(st['min_ms']):>11} {format_ms(st['median_ms']):>11} "
+               f"{format_ms(st['p95_ms']):>11} {peak:>10} {st['lines']:>6} {st['hyphens']:>8} "
+               f"{st['raggedness']:>11}")
 
 
 # ==================== IO HELPERS ====================
@@ -328,8 +2077,7 @@ def read_int_with_prompt(prompt, valid_values=None, allow_empty=False):
 
 
 def print_lines(lines):
-    for i, line in enumerate(lines, 1):
-        print(f"{i:3}: {line}")
+    sys.stdout.write("".join(f"{i:3}: {line}\n" for i, line in enumerate(lines, 1)))
 
 
 def format_ms(ms):
@@ -364,8 +2112,8 @@ def read_text():
                     continue
                 if path.lower() == "back":
                     return ""
-                with open(path, "r", encoding="utf-8") as f:
-                    return f.read().strip()
+                # Файлыг str болгож уншихгүй: mmap дээрх үгсийн span-ууд
+                return MappedText(path)
             except FileNotFoundError:
                 print("Файл олдсонгүй.")
             except Exception as e:
@@ -378,25 +2126,47 @@ def read_text():
     )
 
 
-def save_output(filename, text, max_width, just_type, algo_choice, out=None, algorithms=None, results=None, times=None):
+def report_lines(text, max_width, just_type, algo_choice, out=None, algorithms=None, results=None, times=None,
+                 profile=None):
+    # profile: profile_algorithms()-ийн статистик (харьцуулалтын үед хүснэгтээр гарна)
+    yield "=" * 60
+    yield "ТЕКСТИЙГ ЖИГДЛЭХ ПРОГРАМ - ҮР ДҮН"
+    yield "=" * 60
+    yield ""
+    yield f"Текст урт: {len(text)} тэмдэгт"
+    yield f"Мөрийн өргөн: {max_width}"
+    yield f"Жигдлэлийн төрөл: {['Зүүн','Баруун','Төв','Хоёр талд'][just_type-1]}"
+    if algo_choice != 5:
+        yield f"Алгоритм: {['Greedy','Greedy+Hyphenation','DP','DP+Hyphenation'][algo_choice-1]}"
+        q = layout_quality(out or [], max_width)
+        yield f"Чанар: {q['lines']} мөр, {q['hyphens']} таслалт, raggedness {q['raggedness']}, өртөг {q['cost']}"
+        yield ""
+        for i, line in enumerate(out or (), 1):
+            yield f"{i:3}: {line}"
+    else:
+        yield "Алгоритм: Бүх алгоритмын харьцуулалт"
+        if profile:
+            trials = next(iter(profile.values()))["trials"]
+            yield f"Хэмжилт: алгоритм бүр {trials} удаа, ээлжлэн"
+            yield ""
+            yield from format_profile(profile)
+        yield ""
+        for i, (name, out_lines) in enumerate(zip(algorithms, results)):
+            yield ""
+            yield f"{name} ({format_ms(times[i])}):"
+            for j, line in enumerate(out_lines, 1):
+                yield f"{j:3}: {line}"
+
+
+def save_output(filename, text, max_width, just_type, algo_choice, out=None, algorithms=None, results=None, times=None,
+                profile=None):
+    # filename нь .gz-ээр төгсвөл gzip-ээр шахна
     try:
-        with open(filename, "w", encoding="utf-8") as f:
-            f.write("=" * 60 + "\nТЕКСТИЙГ ЖИГДЛЭХ ПРОГРАМ - ҮР ДҮН\n" + "=" * 60 + "\n\n")
-            f.write(f"Текст урт: {len(text)} тэмдэгт\n")
-            f.write(f"Мөрийн өргөн: {max_width}\n")
-            f.write(f"Жигдлэлийн төрөл: {['Зүүн','Баруун','Төв','Хоёр талд'][just_type-1]}\n")
-            if algo_choice != 5:
-                f.write(f"Алгоритм: {['Greedy','Greedy+Hyphenation','DP','DP+Hyphenation'][algo_choice-1]}\n\n")
-                if out:
-                    for i, line in enumerate(out, 1):
-                        f.write(f"{i:3}: {line}\n")
-            else:
-                f.write("Алгоритм: Бүх алгоритмын харьцуулалт\n\n")
-                for i, (name, out_lines) in enumerate(zip(algorithms, results)):
-                    f.write(f"\n{name} ({format_ms(times[i])}):\n")
-                    for j, line in enumerate(out_lines, 1):
-                        f.write(f"{j:3}: {line}\n")
-        print(f"Хадгаллаа: {filename}")
+        t0 = time.perf_counter()
+        with OutputWriter(filename) as writer:
+            writer.write_lines(report_lines(text, max_width, just_type, algo_choice, out, algorithms, results, times,
+                                            profile))
+        print(f"Хадгаллаа: {filename} ({format_ms((time.perf_counter() - t0) * 1000)})")
     except Exception as e:
         print(f"Файл хадгалахад алдаа: {e}")
 
@@ -404,7 +2174,8 @@ def save_output(filename, text, max_width, just_type, algo_choice, out=None, alg
 # ==================== MAIN ====================
 
 def main():
-    hy = MultiLangHyphenator()
+    hy = MultiLangHyphenator(engine="native")
+    layouts = LayoutCache()  # жигдлэлийн төрлийг солиход таслалтыг дахин бодохгүй
     clear_screen()
 
     while True:
@@ -439,98 +2210,37 @@ def main():
             if max_width < 20 or max_width > 200:
                 max_width = 60
 
-            words = split_words(text)
-
-            if algo_choice == 1:
-                t0 = time.perf_counter() * 1_000_000
-                g_lines = greedy_break(words, max_width)
-                t1 = time.perf_counter() * 1_000_000
-                out = format_by_type(g_lines, just_type, max_width)
-                elapsed_ms = (t1 - t0) / 1_000_000
-                print(f"\nGREEDY ({format_ms(elapsed_ms)})")
-                print_lines(out)
-
-            elif algo_choice == 2:
-                t0 = time.perf_counter() * 1_000_000
-                if just_type == 4:
-                    out = greedy_justify_with_hyphenation(words, max_width, hy)
-                else:
-                    g_lines = greedy_break(words, max_width)
-                    out = format_by_type(g_lines, just_type, max_width, True, hy)
-                t1 = time.perf_counter() * 1_000_000
-                elapsed_ms = (t1 - t0) / 1_000_000
-                print(f"\nGREEDY+HYPHEN ({format_ms(elapsed_ms)})")
-                print_lines(out)
-
-            elif algo_choice == 3:
-                t0 = time.perf_counter() * 1_000_000
-                if just_type == 4:
-                    out = dp_justify_with_hyphenation(" ".join(words), max_width)
-                else:
-                    dp_lines = dp_break(words, max_width)
-                    out = format_by_type(dp_lines, just_type, max_width)
-                t1 = time.perf_counter() * 1_000_000
-                elapsed_ms = (t1 - t0) / 1_000_000
-                print(f"\nDP ({format_ms(elapsed_ms)})")
-                print_lines(out)
-
-            elif algo_choice == 4:
-                t0 = time.perf_counter() * 1_000_000
-                dp_hyphen_lines = dp_with_hyphenation(words.copy(), max_width, hy)
-                out = format_by_type(dp_hyphen_lines, just_type, max_width, True, hy)
-                t1 = time.perf_counter() * 1_000_000
-                elapsed_ms = (t1 - t0) / 1_000_000
-                print(f"\nDP+HYPHEN ({format_ms(elapsed_ms)})")
+            if isinstance(text, MappedText):
+                words = text.span_words()
+                metrics = words.metrics()
+            else:
+                words, metrics = split_words(text), None
+
+            if algo_choice in (1, 2, 3, 4):
+                hits = layouts.stats()["hits"]
+                t0 = time.perf_counter()
+                out = justify_words(words, algo_choice, just_type, max_width, hy, metrics, layouts)
+                elapsed_ms = (time.perf_counter() - t0) * 1000
+                label = ["GREEDY", "GREEDY+HYPHEN", "DP", "DP+HYPHEN"][algo_choice - 1]
+                cached = ", таслалт кэшээс" if layouts.stats()["hits"] > hits else ""
+                print(f"\n{label} ({format_ms(elapsed_ms)}{cached})")
                 print_lines(out)
 
             else:  # compare all
                 print("\nБҮХ АЛГОРИТМЫН ХАРЬЦУУЛАЛТ")
-                algorithms = ["Greedy", "Greedy+Hyphen", "DP", "DP+Hyphen"]
-                results, times = [], []
-
-                # 1) Greedy
-                t0 = time.perf_counter() * 1_000_000
-                g_lines = greedy_break(words, max_width)
-                g_out = format_by_type(g_lines, just_type, max_width)
-                t1 = time.perf_counter() * 1_000_000
-                times.append((t1 - t0) / 1_000_000)
-                results.append(g_out)
-
-                # 2) Greedy+Hyphen
-                t0 = time.perf_counter() * 1_000_000
-                if just_type == 4:
-                    gh_out = greedy_justify_with_hyphenation(words, max_width, hy)
-                else:
-                    gh_lines = greedy_break(words, max_width)
-                    gh_out = format_by_type(gh_lines, just_type, max_width, True, hy)
-                t1 = time.perf_counter() * 1_000_000
-                times.append((t1 - t0) / 1_000_000)
-                results.append(gh_out)
-
-                # 3) DP
-                t0 = time.perf_counter() * 1_000_000
-                if just_type == 4:
-                    dp_out = dp_justify_with_hyphenation(" ".join(words), max_width)
-                else:
-                    dp_lines = dp_break(words, max_width)
-                    dp_out = format_by_type(dp_lines, just_type, max_width)
-                t1 = time.perf_counter() * 1_000_000
-                times.append((t1 - t0) / 1_000_000)
-                results.append(dp_out)
-
-                # 4) DP+Hyphen
-                t0 = time.perf_counter() * 1_000_000
-                dp_hyphen_lines = dp_with_hyphenation(words.copy(), max_width, hy)
-                dp_hyphen_out = format_by_type(dp_hyphen_lines, just_type, max_width, True, hy)
-                t1 = time.perf_counter() * 1_000_000
-                times.append((t1 - t0) / 1_000_000)
-                results.append(dp_hyphen_out)
-
-                print("\nГҮЙЦЭТГЭЛ:")
-                for name, t in zip(algorithms, times):
-                    print(f"{name:15}: {format_ms(t)}")
+                print("Алгоритм бүрийг тусдаа процесст ажиллуулах уу? (Y/N)")
+                isolate = input("> ").strip().lower() in ["y", "yes"]
+                algorithms = ALGORITHM_NAMES
+                profile, by_algo = profile_algorithms(words, just_type, max_width, hy, isolate=isolate,
+                                                      metrics=metrics)
+                results = [by_algo[algo] for algo in (1, 2, 3, 4)]
+                times = [profile[algo]["median_ms"] for algo in (1, 2, 3, 4)]
+
+                print(f"\nГҮЙЦЭТГЭЛ ({profile[1]['trials']} удаа, ээлжлэн):")
+                for line in format_profile(profile):
+                    print(line)
                 fastest_idx = times.index(min(times))
-                print(f"\n✓ Хамгийн хурдан: {algorithms[fastest_idx]}")
+                print(f"\n✓ Хамгийн хурдан (медианаар): {algorithms[fastest_idx]}")
 
                 print("\nАль алгоритмын үр дүнг харах вэ?")
                 print("0) Бүгд  1) Greedy  2) Greedy+Hyphen  3) DP  4) DP+Hyphen")
@@ -552,7 +2262,7 @@ def main():
                     save_output(filename, text, max_width, just_type, algo_choice, out=out)
                 else:
                     save_output(filename, text, max_width, just_type, algo_choice,
-                                algorithms=algorithms, results=results, times=times)
+                                algorithms=algorithms, results=results, times=times, profile=profile)
 
             print("\n1) Дахин ажиллуулах  2) Буцах  3) Гарах")
             next_choice = read_int_with_prompt("Сонголт (1-3): ", [1, 2, 3])
@@ -563,7 +2273,228 @@ def main():
                 return
 
 
+def expand_inputs(patterns):
+    paths = []
+    for pattern in patterns:
+        matches = sorted(glob.glob(pattern, recursive=True)) if pattern != "-" else []
+        paths.extend(matches or [pattern])
+    return paths
+
+
+def output_paths(paths, out_dir):
+    # -d: оролтын замыг нийтлэг эх хавтсаас нь харьцангуйгаар хадгална
+    # (docs/a/readme.txt, docs/b/readme.txt бие биенээ дарж бичихгүй)
+    files = {p: os.path.abspath(p) for p in paths if p != "-"}
+    if not files:
+        return {}
+    root = os.path.commonpath([os.path.dirname(p) for p in files.values()])
+    return {p: os.path.join(out_dir, os.path.relpath(full, root)) for p, full in files.items()}
+
+
+def count_bytes(lines, stats):
+    for line in lines:
+        stats["bytes"] += len(line.encode("utf-8"))
+        yield line
+
+
+def count_words(paragraphs, stats):
+    for words in paragraphs:
+        stats["paragraphs"] += 1
+        stats["words"] += len(words)
+        yield words
+
+
+def justify_file(src, dst, algo_choice, just_type, width, hyph=None, executor=None, window=None, cache=None):
+    # Нэг удаад нэг догол мөр л санах ойд байна; MappedText энд удаан бөгөөд үг бүрт 16 байт
+    # хадгалдаг тул ашиглахгүй (benchmark.py --suite cli-input)
+    stats = {"paragraphs": 0, "words": 0, "bytes": 0, "seconds": 0.0}
+    t0 = time.perf_counter()
+    lines = count_bytes(src, stats)
+    if window and algo_choice == 3:
+        stats.update(stream_window_justify(lines, dst, just_type, width, window))
+    elif executor is None:
+        stats.update(stream_justify(lines, dst, algo_choice, just_type, width, hyph, cache))
+    else:
+        paragraphs = count_words(iter_paragraphs(lines), stats)
+        for line in parallel_justify(paragraphs, algo_choice, just_type, width, executor=executor):
+            dst.write(line + "\n")
+    stats["seconds"] = time.perf_counter() - t0
+    return stats
+
+
+def print_throughput(report, out=None, wall=None):
+    # wall: бичилт дуустал хэмжсэн нийт хугацаа (секунд)
+    out = out or sys.stderr
+    print(f"\n{'Файл':30} {'үг':>10} {'MB':>8} {'хугацаа':>12} {'үг/с':>11} {'MB/с':>8}", file=out)
+    total = {"words": 0, "bytes": 0, "seconds": 0.0}
+    for name, st in report + [("НИЙТ", total)]:
+        if st is not total:
+            for key in total:
+                total[key] += st[key]
+        secs = st["seconds"] or 1e-9
+        mb = st["bytes"] / 1_000_000
+        print(f"{name[-30:]:30} {st['words']:>10} {mb:>8.2f} {format_ms(st['seconds'] * 1000):>12} "
+              f"{st['words'] / secs:>11.0f} {mb / secs:>8.2f}", file=out)
+    if wall is not None:
+        print(f"Нийт хугацаа (бичилт дуустал): {format_ms(wall * 1000)}", file=out)
+
+
+def cli(argv):
+    import argparse
+    parser = argparse.ArgumentParser(description="Текстийг жигдлэх програм (цэсгүй горим)")
+    parser.add_argument("inputs", nargs="*", default=["-"],
+                        help="оролтын файл эсвэл glob (жишээ нь 'docs/**/*.txt'), '-' бол stdin")
+    parser.add_argument("-a", "--algo", type=int, choices=[1, 2, 3, 4], default=3,
+                        help="1) Greedy 2) Greedy+Hyphenation 3) DP 4) DP+Hyphenation")
+    parser.add_argument("-t", "--type", type=int, choices=[1, 2, 3, 4], default=1,
+                        help="1) Зүүн 2) Баруун 3) Төв 4) Хоёр талд")
+    parser.add_argument("-w", "--width", type=int, default=60)
+    parser.add_argument("-o", "--output", default="-", help="гаралтын файл ('.gz' бол gzip), '-' бол stdout")
+    parser.add_argument("-d", "--out-dir", help="файл бүрийн үр дүнг энэ хавтаст оролтын харьцангуй замаар нь хадгална")
+    parser.add_argument("-j", "--jobs", type=int, default=1, help="процессын тоо, 0 бол бүх цөм")
+    parser.add_argument("-q", "--quiet", action="store_true", help="хурдны тайланг хэвлэхгүй")
+    parser.add_argument("--window", type=int, help="-a 3 үед DP-г N үгийн цонхоор урсгалаар бодно "
+                                                   "(маш урт догол мөрийн санах ой, эхний мөрийн хоцрогдлыг хязгаарлана)")
+    parser.add_argument("--metrics", help="үе шат бүрийн хэмжилтийг хадгалах файл ('.prom' бол Prometheus, "
+                                          "бусад нь JSON), '-' бол stderr")
+    parser.add_argument("--layout-cache", type=int, default=0,
+                        help="давтагдсан догол мөрийн таслалтыг санах кэшийн хэмжээ (догол мөрөөр, -j 1 үед), "
+                             "0 бол унтраана")
+    parser.add_argument("--engine", choices=["native", "mapped", "pyphen"], default="native",
+                        help="hyphenation: native (trie), mapped (хөрвүүлсэн толийг mmap-аар, эхлэл хурдан, "
+                             "ажилчид санах ойг хуваалцана), pyphen")
+    parser.add_argument("--compile-dic", nargs="+", metavar="DIC",
+                        help=".dic файлуудыг mapped engine-ий хоёртын хүснэгт болгон хөрвүүлээд гарна")
+    parser.add_argument("--hyphen-cache", help="таслалтын байнгын кэш (SQLite файл), ажиллуулалт хооронд хуваалцана")
+    parser.add_argument("--warm-cache", action="store_true",
+                        help="оролтын үгсийг --hyphen-cache-д урьдчилан бичээд гарна (жигдлэхгүй)")
+    args = parser.parse_args(argv)
+    if args.warm_cache and not args.hyphen_cache:
+        parser.error("--warm-cache нь --hyphen-cache-тэй хамт хэрэглэгдэнэ")
+    if args.window and args.algo != 3:
+        parser.error("--window нь зөвхөн -a 3 (DP)-тэй хэрэглэгдэнэ")
+    if args.window and args.jobs != 1:
+        parser.error("--window нь -j 1 үед л ажиллана (урсгал DP нэг процесст)")
+    if args.layout_cache > 0 and (args.jobs != 1 or args.window):
+        parser.error("--layout-cache нь -j 1 үед, --window-гүй л хэрэглэгдэнэ")
+    probe = Instrumentation().enable() if args.metrics else None
+    try:
+        return run_cli(args)
+    finally:
+        if probe is not None:
+            probe.disable()
+            export_metrics(probe, args.metrics)
+
+
+def export_metrics(probe, target):
+    text = probe.to_prometheus() if target.endswith(".prom") else probe.to_json() + "\n"
+    if target == "-":
+        sys.stderr.write(text)
+    else:
+        with open(target, "w", encoding="utf-8") as f:
+            f.write(text)
+
+
+def warm_hyphen_cache(paths, hyph, executor=None):
+    # Корпусын үгийн санг hyph.store-д урьдчилан бичиж, хуучин толины мөрүүдийг устгана
+    t0 = time.perf_counter()
+    vocab = {}
+    for path in paths:
+        src = sys.stdin if path == "-" else open(path, "r", encoding="utf-8")
+        try:
+            for line in src:
+                vocab.update(dict.fromkeys(line.split()))
+        finally:
+            if src is not sys.stdin:
+                src.close()
+    before = hyph.store.count()
+    hyph.hyphenate_many(list(vocab), executor)
+    keys = {hyph.dic_key(lang) for lang in hyph.languages} - {None}
+    pruned = sum(hyph.store.prune(key) for key in keys)
+    return {"words": len(vocab), "new": hyph.store.count() - before + pruned, "pruned": pruned,
+            "seconds": time.perf_counter() - t0}
+
+
+def warm_cli(args):
+    hy = MultiLangHyphenator(engine=args.engine, store=args.hyphen_cache)
+    pool = make_pool(args.jobs or None, args.engine) if args.jobs != 1 else None
+    try:
+        st = warm_hyphen_cache(expand_inputs(args.inputs), hy, pool)
+    finally:
+        if pool is not None:
+            pool.shutdown()
+        hy.store.close()
+    if not args.quiet:
+        print(f"Кэш дүүргэлээ: {st['words']} ялгаатай үг, {st['new']} шинэ, {st['pruned']} хуучин мөр устгав "
+              f"({format_ms(st['seconds'] * 1000)}) -> {args.hyphen_cache}", file=sys.stderr)
+    return 0
+
+
+def run_cli(args):
+    if args.compile_dic:
+        for path in args.compile_dic:
+            out = compile_dic(path)
+            if not args.quiet:
+                print(f"{path} -> {out} ({os.path.getsize(out) / 1024:.0f} KB)", file=sys.stderr)
+        return 0
+    if args.warm_cache:
+        return warm_cli(args)
+    need_hyph = args.algo in (2, 4)
+    hy = MultiLangHyphenator(engine=args.engine, store=args.hyphen_cache) if need_hyph and args.jobs == 1 else None
+    pool = (make_pool(args.jobs or None, args.engine, need_hyph, args.hyphen_cache)
+            if args.jobs != 1 else None)
+    cache = LayoutCache(args.layout_cache) if args.layout_cache > 0 else None
+    paths = expand_inputs(args.inputs)
+    targets = output_paths(paths, args.out_dir) if args.out_dir else {}
+    if args.out_dir:
+        os.makedirs(args.out_dir, exist_ok=True)
+    t0 = time.perf_counter()
+    dst = OutputWriter(args.output)
+    report, status = [], 0
+    try:
+        for path in paths:
+            try:
+                src = sys.stdin if path == "-" else open(path, "r", encoding="utf-8")
+            except OSError as e:
+                print(f"Файл нээхэд алдаа: {e}", file=sys.stderr)
+                status = 1
+                continue
+            out = dst
+            if path in targets:
+                os.makedirs(os.path.dirname(targets[path]), exist_ok=True)
+                out = OutputWriter(targets[path])
+            try:
+                report.append((path, justify_file(src, out, args.algo, args.type, args.width, hy, pool, args.window,
+                                                   cache)))
+            finally:
+                if src is not sys.stdin:
+                    src.close()
+                if out is not dst:
+                    out.close()
+                if hy is not None:
+                    hy.flush_store()
+        dst.close()
+    except BrokenPipeError:
+        # уншигч тал (жишээ нь head) гаралтыг эрт хаасан
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        return 1
+    finally:
+        if pool is not None:
+            pool.shutdown()
+        if hy is not None and hy.store is not None:
+            hy.store.close()
+        dst.close()
+    if report and not args.quiet:
+        print_throughput(report, wall=time.perf_counter() - t0)
+        st = cache.stats() if cache is not None else None
+        if st and st["hits"] + st["misses"]:
+            print(f"Layout кэш: {st['hits']} hit / {st['misses']} miss ({st['hit_rate']:.1%}), "
+                  f"{st['size']} догол мөр", file=sys.stderr)
+    return status
+
 if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        sys.exit(cli(sys.argv[1:]))
     try:
         main()
     except KeyboardInterrupt:
@@ -0,0 +1,252 @@
+import argparse
+import asyncio
+import json
+import statistics
+import time
+import sys
+import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+import biydaalt2 as bd
+
+
+# Протокол: мөр бүр нэг JSON.
+#   хүсэлт: {"id": 1, "text": "...", "algo": 3, "type": 1, "width": 60}
+#   хариу:  {"id": 1, "lines": [...]}  эсвэл  {"id": 1, "error": "..."}
+#   {"cmd": "stats"} -> хурд болон p50/p99 хоцрогдол
+
+MAX_WIDTH = 10_000
+
+
+def parse_job(req):
+    text = req.get("text")
+    algo, just_type, width = req.get("algo", 3), req.get("type", 1), req.get("width", 60)
+    if not isinstance(text, str):
+        raise ValueError("text заавал string байна")
+    if algo not in (1, 2, 3, 4) or just_type not in (1, 2, 3, 4):
+        raise ValueError("algo болон type нь 1-4 байна")
+    # bool нь int-ийн дэд анги тул тусад нь хасна
+    if isinstance(width, bool) or not isinstance(width, int) or not 0 < width <= MAX_WIDTH:
+        raise ValueError(f"width 1-{MAX_WIDTH} хүртэлх бүхэл тоо байна")
+    return text, algo, just_type, width
+
+
+def run_batch(jobs, hyph=None):
+    # Ажлын процесс/thread дотор: нэг багц хүсэлтийг дараалан жигдэлнэ.
+    # Алдаа гарвал зөвхөн тэр хүсэлтэд {"error": ...} буцаана, бусад нь хэвээр.
+    hyph = hyph or bd._worker_hyph
+    results = []
+    for text, algo, just_type, width in jobs:
+        try:
+            results.append(list(bd.iter_justified(text.splitlines(), algo, just_type, width, hyph)))
+        except Exception as e:
+            results.append({"error": str(e) or type(e).__name__})
+    return results
+
+
+class JustifyServer:
+    def __init__(self, host="127.0.0.1", port=8765, workers=2, mode="thread",
+                 batch_window_ms=2.0, max_batch=64):
+        self.host, self.port = host, port
+        self.batch_window = batch_window_ms / 1000
+        self.max_batch = max_batch
+        self.workers = workers
+        if mode == "process":
+            self.hyph = None
+            self.executor = bd.make_pool(workers)
+        else:
+            # Thread-үүд нэг hyphenator болон түүний LRU кэшийг хуваалцана
+            self.hyph = bd.MultiLangHyphenator(engine="native")
+            self.executor = ThreadPoolExecutor(workers)
+        self.queue = None
+        self.server = None
+        self.clients = {}  # handler task -> writer; close() хаана
+        self.running = set()  # гүйж буй багцын task-ууд (GC-д алдахгүй, close() цуцална)
+        self.started = time.perf_counter()
+        self.requests = self.words = self.batches = self.errors = 0
+        self.latencies = deque(maxlen=10_000)
+
+    async def start(self):
+        self.queue = asyncio.Queue()
+        self.batcher = asyncio.create_task(self._batch_loop())
+        self.server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self.server.sockets[0].getsockname()[1]
+        self.started = time.perf_counter()
+        return self
+
+    async def close(self):
+        # Нээлттэй холболтуудыг хааж, handler-уудыг цуцлаад дуусахыг нь хүлээнэ;
+        # эс бөгөөс wait_closed гацаж, event loop хаагдахад CancelledError хэвлэгдэнэ.
+        self.server.close()
+        for writer in self.clients.values():
+            writer.close()
+        tasks = [self.batcher, *self.running, *self.clients]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        while not self.queue.empty():
+            self.queue.get_nowait()[1].cancel()
+        await self.server.wait_closed()
+        self.executor.shutdown(cancel_futures=True)
+
+    async def serve_forever(self):
+        async with self.server:
+            await self.server.serve_forever()
+
+    async def justify(self, text, algo=3, just_type=1, width=60):
+        fut = asyncio.get_running_loop().create_future()
+        await self.queue.put(((text, algo, just_type, width), fut))
+        return await fut
+
+    async def _batch_loop(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            deadline = loop.time() + self.batch_window
+            try:
+                while len(batch) < self.max_batch:
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+                    except asyncio.TimeoutError:
+                        break
+            except asyncio.CancelledError:
+                for _, fut in batch:
+                    fut.cancel()
+                raise
+            task = asyncio.create_task(self._run(batch))
+            self.running.add(task)
+            task.add_done_callback(self.running.discard)
+
+    async def _run(self, batch):
+        jobs = [job for job, _ in batch]
+        self.batches += 1
+        try:
+            results = await asyncio.get_running_loop().run_in_executor(self.executor, run_batch, jobs, self.hyph)
+        except asyncio.CancelledError:
+            # close(): хүлээж буй хүсэлтүүдийг шийдэгдээгүй үлдээхгүй
+            for _, fut in batch:
+                fut.cancel()
+            raise
+        except Exception as e:
+            for _, fut in batch:
+                if not fut.done():
+                    fut.set_exception(e)
+            return
+        for (_, fut), lines in zip(batch, results):
+            if fut.done():
+                continue
+            if isinstance(lines, dict):
+                fut.set_exception(ValueError(lines["error"]))
+            else:
+                fut.set_result(lines)
+
+    async def _handle(self, reader, writer):
+        # Нэг холболтоор ирсэн хүсэлтүүдийг зэрэг боловсруулна (багцлахын тулд);
+        # хариу дуусах дарааллаар гарах тул "id"-аар нь тааруулна.
+        lock, pending = asyncio.Lock(), set()
+        self.clients[asyncio.current_task()] = writer
+
+        async def reply(line):
+            resp = await self._respond(line)
+            async with lock:
+                writer.write(json.dumps(resp, ensure_ascii=False).encode("utf-8") + b"\n")
+                await writer.drain()
+
+        try:
+            while line := await reader.readline():
+                task = asyncio.create_task(reply(line))
+                pending.add(task)
+                task.add_done_callback(pending.discard)
+            if pending:
+                await asyncio.gather(*pending)
+        except (ConnectionError, asyncio.CancelledError):
+            # CancelledError-ийг зөвхөн close() илгээнэ; task-ийг цуцлагдсан төлөвт үлдээвэл
+            # asyncio.streams-ийн callback алдаа хэвлэнэ
+            pass
+        finally:
+            for task in pending:
+                task.cancel()
+            self.clients.pop(asyncio.current_task(), None)
+            writer.close()
+
+    async def _respond(self, line):
+        t0 = time.perf_counter()
+        req_id = None
+        try:
+            req = json.loads(line)
+            req_id = req.get("id")
+            if req.get("cmd") == "stats":
+                return {"id": req_id, "stats": self.stats()}
+            job = parse_job(req)
+            lines = await self.justify(*job)
+        except Exception as e:
+            self.errors += 1
+            return {"id": req_id, "error": str(e)}
+        self.requests += 1
+        self.words += len(job[0].split())
+        self.latencies.append((time.perf_counter() - t0) * 1000)
+        return {"id": req_id, "lines": lines}
+
+    def stats(self):
+        elapsed = time.perf_counter() - self.started
+        lat = sorted(self.latencies)
+        pick = lambda q: lat[min(len(lat) - 1, int(q * len(lat)))] if lat else 0.0
+        result = {
+            "requests": self.requests,
+            "errors": self.errors,
+            "batches": self.batches,
+            "avg_batch": self.requests / self.batches if self.batches else 0.0,
+            "requests_per_s": self.requests / elapsed if elapsed else 0.0,
+            "words_per_s": self.words / elapsed if elapsed else 0.0,
+            "p50_ms": statistics.median(lat) if lat else 0.0,
+            "p99_ms": pick(0.99),
+        }
+        if self.hyph is not None:
+            result["hyphen_cache"] = self.hyph.cache_stats()
+        return result
+
+
+async def request(host, port, payloads):
+    # Туслах клиент: хүсэлтүүдийг нэг холболтоор илгээж, хариуг хүсэлтийн дарааллаар буцаана
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        for payload in payloads:
+            writer.write(json.dumps(payload, ensure_ascii=False).encode("utf-8") + b"\n")
+        await writer.drain()
+        responses = [json.loads(await reader.readline()) for _ in payloads]
+    finally:
+        writer.close()
+        await writer.wait_closed()
+    order = {p.get("id"): k for k, p in enumerate(payloads)}
+    return sorted(responses, key=lambda r: order.get(r.get("id"), len(payloads)))
+
+
+async def serve(args):
+    server = await JustifyServer(args.host, args.port, args.workers, args.mode,
+                                 args.batch_window, args.max_batch).start()
+    print(f"Сервер ажиллаж байна: {server.host}:{server.port} ({args.mode}, {args.workers} ажилчин)")
+    await server.serve_forever()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Текст жигдлэх JSON-over-TCP сервер")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--mode", choices=["thread", "process"], default="thread")
+    parser.add_argument("--batch-window", type=float, default=2.0, help="багцлах хугацаа (ms)")
+    parser.add_argument("--max-batch", type=int, default=64)
+    args = parser.parse_args(argv)
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        print("\nСервер зогслоо.")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,10 @@
 import unittest
+import io
+import json
+import tempfile
+import gzip
+import random
+import asyncio
 from unittest.mock import MagicMock, patch
 import sys
 import os
@@ -6,6 +12,8 @@ import os
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 import biydaalt2 as bd
+import benchmark
+import server
 
 
 class TestTextJustifier(unittest.TestCase):
@@ -28,6 +36,15 @@ class TestTextJustifier(unittest.TestCase):
         self.assertEqual(bd.justify_line(["Hello"], 10), "Hello     ")
         self.assertEqual(bd.justify_line(["Hello", "world"], 15), "Hello     world")
 
+    def test_join_gaps_and_pad_center(self):
+        self.assertEqual(bd.join_gaps(["a", "b", "c", "d"], 1, 2), "a  b  c d")
+        self.assertEqual(bd.join_gaps(["a", "b"], 0, 0), "ab")
+        self.assertEqual(bd.justify_line(["ab", "c", "de"], 10), "ab   c  de")
+        self.assertEqual(bd.pad_center("abc", 8), "  abc   ")
+        self.assertEqual(bd.pad_center("abcdef", 4), "abcdef")
+        self.assertEqual(bd.spaces(-3), "")
+        self.assertEqual(bd.spaces(300), " " * 300)
+
     def test_greedy_break(self):
         words = ["a", "bb", "ccc"]
         lines = bd.greedy_break(words, 4)
@@ -42,6 +59,27 @@ class TestTextJustifier(unittest.TestCase):
             line_str = " ".join(line)
             self.assertLessEqual(len(line_str), 5)
 
+    def test_fast_dp_break_matches_dp_break(self):
+        rnd = random.Random(0)
+        for _ in range(300):
+            words = ["x" * rnd.randint(1, rnd.choice([4, 10, 40])) for _ in range(rnd.randint(0, 80))]
+            width = rnd.randint(1, 60)
+            self.assertEqual(bd.fast_dp_break(words, width), bd.dp_break(words, width))
+        self.assertEqual(bd.fast_dp_break([], 10), [])
+
+    def test_line_metrics(self):
+        words = ["aaa", "bb", "c"]
+        m = bd.LineMetrics(words)
+        self.assertEqual(m.prefix, [0, 3, 5, 6])
+        self.assertEqual(m.length(0, 3), len("aaa bb c"))
+        self.assertEqual(m.length(1, 2), 2)
+        self.assertEqual(m.word_len(2), 1)
+        self.assertEqual(bd.greedy_break(words, 6, m), bd.greedy_break(words, 6))
+        self.assertEqual(bd.dp_break(words, 6, m), bd.fast_dp_break(words, 6, m))
+
+    def test_dp_justify_with_hyphenation_long_word(self):
+        lines = bd.dp_justify_with_hyphenation("a bbbbbbbb c", 5)
+        self.assertEqual(lines, ["a    ", "bbbbbbbb", "c    "])
 
     def test_greedy_hyphenation(self):
         words = ["энэ", "бол", "монгол"]
@@ -50,6 +88,26 @@ class TestTextJustifier(unittest.TestCase):
         for line in result:
             self.assertIsInstance(line, str)
 
+    def test_dp_with_hyphenation_breakpoint_graph(self):
+        words = ["энэ", "бол", "монгол", "хэл", "монгол"]
+        original = list(words)
+        lines = bd.dp_with_hyphenation(words, 8, self.mock_hyph)
+        self.assertEqual(words, original)
+        self.assertEqual(self.mock_hyph.hyphenate.call_count, len(set(words)))
+        for line in lines:
+            self.assertLessEqual(len(" ".join(line)), 8)
+        self.assertEqual("".join("".join(line) for line in lines).replace("-", ""), "".join(words))
+        self.assertEqual(lines, [["энэ", "бол"], ["монгол"], ["хэл", "мон-"], ["гол"]])
+
+    def test_dp_with_hyphenation_without_cuts_matches_dp_break(self):
+        hyph = MagicMock()
+        hyph.hyphenate.return_value = []
+        rnd = random.Random(2)
+        for _ in range(100):
+            words = ["x" * rnd.randint(1, 12) for _ in range(rnd.randint(0, 40))]
+            width = rnd.randint(3, 30)
+            self.assertEqual(bd.dp_with_hyphenation(words, width, hyph), bd.dp_break(words, width))
+
     def test_format_by_type(self):
         lines = [["Hello", "world"]]
         width = 15
@@ -89,6 +147,196 @@ class TestTextJustifier(unittest.TestCase):
         self.assertEqual(cuts, [3])
         mock_instance.inserted.assert_called_with("монгол")
 
+    def test_compact_layout_matches_lists(self):
+        words = bd.split_words("Монгол хэл бол Монгол улсын албан ёсны хэл юм " * 5)
+        split = lambda w: [3] if w == "Монгол" else [2] if w == "албан" else []
+        for breaker in (bd.greedy_break, bd.dp_break, bd.fast_dp_break):
+            layout = breaker(words, 13, compact=True)
+            self.assertIsInstance(layout.ends, bd.array)
+            self.assertEqual(list(layout), breaker(words, 13))
+        hyph = MagicMock()
+        hyph.hyphenate.side_effect = split
+        layout = bd.dp_with_hyphenation(words, 16, hyph, hyphen_penalty=0, compact=True)
+        lines = bd.dp_with_hyphenation(words, 16, hyph, hyphen_penalty=0)
+        self.assertEqual(list(layout), lines)
+        self.assertEqual([layout[k] for k in range(len(layout))], lines)
+        self.assertEqual([layout.hyphenated(k) for k in range(len(layout))], [l[-1].endswith("-") for l in lines])
+        self.assertTrue(any(layout.hyphenated(k) for k in range(len(layout))))
+        for empty in (bd.greedy_break([], 10, compact=True), bd.dp_break([], 10, compact=True),
+                      bd.fast_dp_break([], 10, compact=True), bd.dp_with_hyphenation([], 10, hyph, compact=True)):
+            self.assertIsInstance(empty, bd.BreakLayout)
+            self.assertEqual((len(empty), list(empty)), (0, []))
+
+    def test_lru_cache_eviction(self):
+        cache = bd.LRUCache(2)
+        cache.put("a", 1)
+        cache.put("b", 2)
+        self.assertEqual(cache.get("a"), 1)
+        cache.put("c", 3)  # "b" хамгийн удаан хэрэглэгдээгүй
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("c"), 3)
+        stats = cache.stats()
+        self.assertEqual((stats["hits"], stats["misses"], stats["evictions"]), (2, 1, 1))
+
+    @patch("pyphen.Pyphen")
+    def test_hyphenate_uses_cache(self, mock_pyphen):
+        mock_instance = MagicMock()
+        mock_instance.inserted.return_value = "мон-гол"
+        mock_pyphen.return_value = mock_instance
+
+        h = bd.MultiLangHyphenator(cache_size=8)
+        first = h.hyphenate("монгол")
+        first.append(99)  # дуудагч жагсаалтаа өөрчилсөн ч кэш өөрчлөгдөхгүй
+        self.assertEqual(h.hyphenate("монгол"), [3])
+        self.assertEqual(mock_instance.inserted.call_count, 1)
+        self.assertEqual(h.cache_stats()["hits"], 1)
+
+    def test_native_hyphenator_matches_pyphen(self):
+        with open("test.txt", encoding="utf-8") as f:
+            en_words = bd.split_words(f.read())
+        with open("test2.txt", encoding="utf-8") as f:
+            mn_words = bd.split_words(f.read())
+        for dic_path, words in (("hyph_en_US.dic", en_words), ("hyph_mn_MN.dic", mn_words)):
+            slow, fast = bd.PyphenHyphenator(dic_path), bd.LiangHyphenator(dic_path)
+            for w in words:
+                self.assertEqual(fast.positions(w), slow.positions(w), w)
+
+    def test_native_hyphenator_rules(self):
+        en = bd.LiangHyphenator("hyph_en_US.dic")
+        self.assertEqual((en.left, en.right), (2, 3))
+        cuts = en.positions("hyphenation")
+        self.assertGreater(len(cuts), 1)
+        self.assertTrue(all(2 <= c <= len("hyphenation") - 3 for c in cuts))
+        mn = bd.LiangHyphenator("hyph_mn_MN.dic")
+        self.assertIn("-", mn.nohyphen)
+        for c in mn.positions("ахмад-дайчин"):
+            self.assertNotIn(c, (5, 6))  # '-'-ийн өмнө/ард таслахгүй
+
+    def test_mapped_hyphenator_matches_native(self):
+        with open("test.txt", encoding="utf-8") as f:
+            words = bd.split_words(f.read()) + ["ахмад-дайчин", "монгол", "hyphenation"]
+        with tempfile.TemporaryDirectory() as tmp, patch.dict(os.environ, {"HYPH_CACHE_DIR": tmp}):
+            for dic_path in ("hyph_en_US.dic", "hyph_mn_MN.dic"):
+                native, mapped = bd.LiangHyphenator(dic_path), bd.MappedHyphenator(dic_path)
+                self.assertEqual((mapped.left, mapped.right, mapped.nohyphen),
+                                 (native.left, native.right, native.nohyphen))
+                self.assertEqual([mapped.positions(w) for w in words], [native.positions(w) for w in words])
+                # процесс бүрд ирмэгийн хувийн хуулбар үүсгэхгүй
+                self.assertFalse([v for v in vars(mapped).values() if isinstance(v, dict)])
+                mapped.close()
+
+            dic = os.path.join(tmp, "hyph_xx.dic")
+            with open(dic, "w", encoding="utf-8") as f:
+                f.write("UTF-8\n1b\n")
+            compiled = bd.compiled_dic(dic)
+            self.assertEqual(bd.compiled_dic(dic), compiled)
+            before = os.path.getmtime(compiled)
+            self.assertEqual(bd.MappedHyphenator(dic, 1, 1).positions("abab"), [1, 3])
+            with open(dic, "a", encoding="utf-8") as f:
+                f.write("b1a\n")  # .dic засагдвал автоматаар дахин хөрвүүлнэ
+            self.assertEqual(bd.MappedHyphenator(dic, 1, 1).positions("abab"), [1, 2, 3])
+            self.assertGreaterEqual(os.path.getmtime(compiled), before)
+            st = os.stat(dic)
+            os.utime(dic, ns=(st.st_atime_ns, st.st_mtime_ns + 10 ** 9))  # агуулга ижил, mtime өөр
+            with patch.object(bd, "compile_dic", side_effect=AssertionError("recompile")):
+                self.assertEqual(bd.compiled_dic(dic), compiled)
+                with patch("hashlib.sha1", side_effect=AssertionError("rehash")):
+                    self.assertEqual(bd.compiled_dic(dic), compiled)
+            self.assertEqual(bd.MappedHyphenator(dic, 1, 1).positions("abab"), [1, 2, 3])
+
+    def test_dictionaries_load_lazily(self):
+        h = bd.MultiLangHyphenator(engine="native", max_loaded=1)
+        self.assertEqual(list(h.loaded), [])
+        h.hyphenate("монгол")
+        self.assertEqual(list(h.loaded), ["mn"])
+        en_cuts = h.hyphenate("hyphenation")
+        self.assertEqual(list(h.loaded), ["en"])  # max_loaded=1 тул mn буулгагдана
+        h.register("xx", "hyph_en_US.dic")
+        self.assertEqual(h.hyphenate("hyphenation", lang="xx"), en_cuts)
+        self.assertEqual(list(h.loaded), ["xx"])
+        self.assertNotIn("xx", bd.LANGUAGES)
+
+    def test_register_drops_stale_cuts(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            dic = os.path.join(tmp, "other.dic")
+            with open(dic, "w", encoding="utf-8") as f:
+                f.write("UTF-8\nLEFTHYPHENMIN 1\nRIGHTHYPHENMIN 1\nhyp1h\n")
+            h = bd.MultiLangHyphenator(engine="native", store=os.path.join(tmp, "hyph.db"))
+            self.assertEqual(h.hyphenate("hyphenation"), [2, 6])
+            self.assertTrue(h.pending)
+            h.register("en", dic)
+            self.assertEqual(h.pending, {})
+            self.assertEqual(h.hyphenate("hyphenation"), [3])
+            h.store.close()
+
+    def test_classify_scripts(self):
+        words = ["монгол", "English", "USB-кабель", "2024", "ӨӨРЧЛӨЛТ", "a-б-c"]
+        self.assertEqual(bd.classify_scripts(words), ["mn", "en", "mixed", "mn", "mn", "mixed"])
+        h = bd.MultiLangHyphenator(engine="native")
+        tags = h.tag_words(words)
+        self.assertEqual([h.detect_lang(w, tags[w]) for w in words], ["mn", "en", "mn", "mn", "mn", "mn"])
+        self.assertEqual([h.detect_lang(w) for w in words], ["mn", "en", "mn", "mn", "mn", "mn"])
+        self.assertFalse(hasattr(h, "scripts"))  # thread-үүд хуваалцах төлөвгүй
+        self.assertEqual(bd.classify_scripts([]), [])
+
+    def test_greedy_hyphen_classifies_once(self):
+        words = bd.split_words("Монгол хэл бол hyphenation algorithm юм " * 50)
+        h = bd.MultiLangHyphenator(engine="native")
+        with patch.object(bd, "classify_scripts", wraps=bd.classify_scripts) as spy:
+            lines = bd.render_breaks(bd.break_words(words, 2, 4, 12, h), 2, 4, 12, h)
+        self.assertEqual(spy.call_count, 1)
+        self.assertEqual(lines, bd.greedy_justify_with_hyphenation(words, 12, bd.MultiLangHyphenator(engine="native")))
+
+    def test_hyphenate_many_table(self):
+        from concurrent.futures import ThreadPoolExecutor
+        words = "монгол хэл hyphenation монгол хэл бичиг hyphenation".split()
+        h = bd.MultiLangHyphenator(engine="native")
+        table = h.hyphenate_many(words)
+        self.assertEqual(len(table.index), 4)
+        self.assertEqual([list(table.positions(k)) for k in range(len(words))],
+                         [bd.MultiLangHyphenator(engine="native").hyphenate(w) for w in words])
+        with ThreadPoolExecutor(2) as ex:
+            pooled = bd.MultiLangHyphenator(engine="native").hyphenate_many(words, ex, chunk=1)
+        self.assertEqual((pooled.ids, pooled.offsets, pooled.cuts), (table.ids, table.offsets, table.cuts))
+        other = table.hyphenate_many(["бичиг", "шинэ"])
+        self.assertIs(other.cuts, table.cuts)
+        self.assertEqual((list(other.positions(1)), table.hyphenate("шинэ")), ([], []))
+        self.assertEqual(bd.dp_with_hyphenation(words, 9, None, table=table), bd.dp_with_hyphenation(words, 9, h))
+
+    def test_persistent_hyphen_cache(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            dic, db, corpus = (os.path.join(tmp, name) for name in ("hyph_mn.dic", "hyph.db", "corpus.txt"))
+            with open("hyph_mn_MN.dic", "rb") as src, open(dic, "wb") as dst:
+                dst.write(src.read())
+            with open(corpus, "w", encoding="utf-8") as f:
+                f.write("монгол хэл бичиг\n\nмонгол улс\n")
+
+            def hyphenator():
+                h = bd.MultiLangHyphenator(engine="native", store=db)
+                h.register("mn", dic)
+                return h
+
+            h = hyphenator()
+            st = bd.warm_hyphen_cache([corpus], h)
+            self.assertEqual((st["words"], st["new"]), (4, 4))
+            expected = [h.hyphenate(w) for w in ("монгол", "бичиг")]
+            h.store.close()
+
+            warm = hyphenator()
+            self.assertEqual([warm.hyphenate(w) for w in ("монгол", "бичиг")], expected)
+            self.assertEqual(list(warm.loaded), [])  # толь ачаалагдаагүй
+            self.assertEqual(warm.store.stats()["hits"], 2)
+            warm.store.close()
+
+            with open(dic, "a", encoding="utf-8") as f:
+                f.write("\n% засвар\n")
+            edited = hyphenator()
+            self.assertEqual(edited.hyphenate("монгол"), expected[0])
+            self.assertEqual(list(edited.loaded), ["mn"])
+            self.assertEqual(bd.warm_hyphen_cache([corpus], edited)["pruned"], 4)
+            self.assertEqual(edited.store.count(), 4)
+            edited.store.close()
+
     def test_detect_lang_in_multilang_hyphenator(self):
         """
         MultiLangHyphenator.detect_lang() логик зөв ажиллаж байгаа эсэх.
@@ -109,6 +357,437 @@ class TestTextJustifier(unittest.TestCase):
         self.assertEqual(h.detect_lang("монgol"), "mn")
         self.assertEqual(h.detect_lang("1234"), "mn")
 
+class TestStreaming(unittest.TestCase):
+    def test_iter_paragraphs(self):
+        src = ["Нэг хоёр\n", "гурав\n", "\n", "\n", "  дөрөв  тав\n"]
+        self.assertEqual(list(bd.iter_paragraphs(src)), [["Нэг", "хоёр", "гурав"], ["дөрөв", "тав"]])
+        self.assertEqual(list(bd.iter_paragraphs([])), [])
+
+    def test_stream_justify_matches_per_paragraph(self):
+        text = "aaa bb c dddd ee\nff ggg\n\nhh iii jjjj k\n"
+        dst = io.StringIO()
+        stats = bd.stream_justify(io.StringIO(text), dst, 3, 4, 10)
+        expected = (bd.justify_words(["aaa", "bb", "c", "dddd", "ee", "ff", "ggg"], 3, 4, 10)
+                    + [""] + bd.justify_words(["hh", "iii", "jjjj", "k"], 3, 4, 10))
+        self.assertEqual(dst.getvalue().split("\n")[:-1], expected)
+        self.assertEqual(list(bd.iter_justified(io.StringIO(text), 3, 4, 10)), expected)
+        self.assertEqual((stats["paragraphs"], stats["words"]), (2, 11))
+
+    def test_layout_cache_reuses_breaks(self):
+        text = "Монгол хэл бол Монгол улсын албан ёсны хэл юм\n\nEnglish text wraps\n\n" \
+               "Монгол хэл бол Монгол улсын албан ёсны хэл юм"
+        hyph = bd.MultiLangHyphenator(engine="native")
+        for algo in (1, 2, 3, 4):
+            cache = bd.LayoutCache(8)
+            for just_type in (1, 2, 3, 4):
+                self.assertEqual(list(bd.iter_justified(text.splitlines(), algo, just_type, 14, hyph, cache)),
+                                 list(bd.iter_justified(text.splitlines(), algo, just_type, 14, hyph)))
+            # 2 ялгаатай догол мөр; Greedy+Hyphen/DP-ийн хоёр талд жигдлэл тусдаа бичлэг
+            self.assertEqual(len(cache), 4 if algo in (2, 3) else 2)
+            self.assertEqual(cache.stats()["misses"], len(cache))
+        small = bd.LayoutCache(1)
+        list(bd.iter_justified(text.splitlines(), 3, 1, 14, cache=small))
+        self.assertEqual((len(small), small.stats()["evictions"]), (1, 2))
+
+    def test_justify_widths_matches_per_width(self):
+        text = "энэ бол монгол хэл\nмонгол бичиг\n\nбол монгол"
+        split = lambda w: [3] if w == "монгол" else []
+        for algo in (1, 2, 3, 4):
+            hyph = MagicMock()
+            hyph.hyphenate.side_effect = split
+            layouts = bd.justify_widths(text, [8, 12, 30], algo, 4, hyph)
+            if algo in (2, 4):
+                self.assertEqual(hyph.hyphenate.call_count, len(set(text.split())))
+            for width, lines in layouts.items():
+                self.assertEqual(lines, list(bd.iter_justified(text.splitlines(), algo, 4, width, hyph)))
+
+    def test_parallel_justify_matches_serial(self):
+        rnd = random.Random(1)
+        paragraphs = [["x" * rnd.randint(1, 9) for _ in range(rnd.randint(1, 40))] for _ in range(12)]
+        serial = list(bd.justify_paragraphs(paragraphs, 3, 4, 20))
+        self.assertEqual(list(bd.parallel_justify(paragraphs, 3, 4, 20, workers=1)), serial)
+        self.assertEqual(list(bd.parallel_justify(paragraphs, 3, 4, 20, workers=2, shard_words=50)), serial)
+        self.assertEqual(list(bd.iter_shards([["a"] * 3] * 4, shard_words=5)), [[["a"] * 3] * 2] * 2)
+        pool = bd.make_pool(2, need_hyph=False)
+        try:
+            self.assertEqual(pool.workers, 2)
+            self.assertEqual(list(bd.parallel_justify(paragraphs, 3, 4, 20, shard_words=50, executor=pool)), serial)
+        finally:
+            pool.shutdown()
+
+    def test_batch_cli_out_dir(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            for name in ("a.txt", "b.txt"):
+                with open(os.path.join(tmp, name), "w", encoding="utf-8") as f:
+                    f.write("Монгол хэл бол Монгол улсын албан ёсны хэл юм\n")
+            out_dir = os.path.join(tmp, "out")
+            report = io.StringIO()
+            with patch("sys.stderr", report):
+                status = bd.cli(["-a", "1", "-w", "20", "-d", out_dir, os.path.join(tmp, "*.txt")])
+            self.assertEqual(status, 0)
+            self.assertEqual(sorted(os.listdir(out_dir)), ["a.txt", "b.txt"])
+            with open(os.path.join(out_dir, "a.txt"), encoding="utf-8") as f:
+                self.assertEqual(f.read().splitlines(), bd.justify_words(
+                    bd.split_words("Монгол хэл бол Монгол улсын албан ёсны хэл юм"), 1, 1, 20))
+            self.assertIn("НИЙТ", report.getvalue())
+
+    def test_cli_rejects_incompatible_options(self):
+        for argv in (["--window", "100", "-a", "1"], ["--window", "100", "-j", "2"],
+                     ["--layout-cache", "8", "-j", "2"], ["--layout-cache", "8", "--window", "100"]):
+            with patch("sys.stderr", io.StringIO()), self.assertRaises(SystemExit):
+                bd.cli(argv)
+
+    def test_cli_layout_cache_stats_only_when_used(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            full, empty = os.path.join(tmp, "a.txt"), os.path.join(tmp, "b.txt")
+            with open(full, "w", encoding="utf-8") as f:
+                f.write("нэг хоёр\n\nнэг хоёр\n")
+            open(empty, "w").close()
+            for path, shown in ((full, True), (empty, False)):
+                report = io.StringIO()
+                with patch("sys.stderr", report):
+                    bd.cli(["-a", "3", "--layout-cache", "8", "-o", os.path.join(tmp, "out.txt"), path])
+                self.assertEqual("Layout кэш: 1 hit / 1 miss" in report.getvalue(), shown)
+
+    def test_batch_cli_out_dir_keeps_subdirs(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            for sub, text in (("a", "нэг хоёр"), ("b", "гурав дөрөв")):
+                os.makedirs(os.path.join(tmp, "docs", sub))
+                with open(os.path.join(tmp, "docs", sub, "readme.txt"), "w", encoding="utf-8") as f:
+                    f.write(text + "\n")
+            out_dir = os.path.join(tmp, "out")
+            with patch("sys.stderr", io.StringIO()):
+                bd.cli(["-q", "-a", "1", "-w", "20", "-d", out_dir, os.path.join(tmp, "docs", "**", "*.txt")])
+            for sub, text in (("a", "нэг хоёр"), ("b", "гурав дөрөв")):
+                with open(os.path.join(out_dir, sub, "readme.txt"), encoding="utf-8") as f:
+                    self.assertEqual(f.read().split(), text.split())
+            self.assertEqual(bd.output_paths(["x/a.txt", "-"], "out"), {"x/a.txt": os.path.join("out", "a.txt")})
+
+    def test_output_writer_targets(self):
+        lines = [f"{k:5} мөр" for k in range(5000)]
+        with tempfile.TemporaryDirectory() as tmp:
+            for name in ("out.txt", "out.txt.gz"):
+                path = os.path.join(tmp, name)
+                with bd.OutputWriter(path, buffer_size=4096) as writer:
+                    writer.write_lines(lines[:10])
+                    writer.write("\n".join(lines[10:]) + "\n")
+                opener = gzip.open if name.endswith(".gz") else open
+                with opener(path, "rt", encoding="utf-8") as f:
+                    self.assertEqual(f.read().splitlines(), lines)
+        dst = io.StringIO()
+        with bd.OutputWriter(dst) as writer:
+            bd.stream_justify(io.StringIO("aaa bb\n\ncc"), writer, 1, 1, 6)
+        self.assertEqual(dst.getvalue(), "aaa bb\n\ncc    \n")
+
+    def test_output_writer_flushes_while_input_idle(self):
+        import time
+        dst = io.StringIO()
+        with bd.OutputWriter(dst, flush_interval=0.02) as writer:
+            writer.write_lines(["aaa bbb", ""])
+            writer.flush()  # flush_interval өнгөрөөгүй: бичигч thread руу хараахан өгөхгүй
+            deadline = time.perf_counter() + 2
+            while not dst.getvalue() and time.perf_counter() < deadline:
+                time.sleep(0.01)  # оролт хүлээж буй мэт: дахин write/flush дуудахгүй
+            self.assertEqual(dst.getvalue(), "aaa bbb\n\n")
+            writer.write_lines(["ccc"])
+        self.assertEqual(dst.getvalue(), "aaa bbb\n\nccc\n")
+
+    def test_output_writer_reports_write_errors(self):
+        target = MagicMock()
+        target.write.side_effect = BrokenPipeError
+        writer = bd.OutputWriter(target)
+        writer.write_lines(["a", "b"])
+        with self.assertRaises(BrokenPipeError):
+            writer.close()
+        writer.close()  # дахин хаахад алдаа давтагдахгүй
+
+    def test_window_dp_break_matches_dp_cost(self):
+        rnd = random.Random(5)
+        for _ in range(100):
+            width = rnd.randint(5, 30)
+            words = ["x" * rnd.randint(1, 12) for _ in range(rnd.randint(0, 120))]
+            full = bd.dp_break(words, width)
+            unbounded = list(bd.window_dp_break(iter(words), width, window=10 ** 6))
+            self.assertEqual(bd.layout_cost(unbounded, width), bd.layout_cost(full, width))
+            windowed = list(bd.window_dp_break(iter(words), width, window=rnd.randint(2, 30)))
+            self.assertEqual([w for line in windowed for w in line], words)
+            self.assertGreaterEqual(bd.layout_cost(windowed, width), bd.layout_cost(full, width))
+
+    def test_window_breaker_bounded_buffer(self):
+        breaker = bd.WindowedBreaker(20, window=50)
+        emitted = 0
+        for k in range(2000):
+            emitted += len(breaker.push("үг" * (1 + k % 5)))
+            self.assertLessEqual(len(breaker.words), 50)
+        self.assertGreater(emitted, 0)
+        dst = io.StringIO()
+        stats = bd.stream_window_justify(io.StringIO("aaa bb c\ndddd\n\nee"), dst, 4, 8, window=3)
+        self.assertEqual(dst.getvalue(), "aaa bb c\ndddd    \n\nee      \n")
+        self.assertEqual((stats["paragraphs"], stats["words"]), (2, 5))
+
+    def test_greedy_hyphenation_long_first_word(self):
+        hyph = MagicMock()
+        hyph.hyphenate.return_value = []
+        result = bd.greedy_justify_with_hyphenation(["aaaaaaaaaa", "b"], 5, hyph)
+        self.assertEqual(result[0], "aaaaaaaaaa")
+
+
+class TestInstrumentation(unittest.TestCase):
+    def test_counts_stages_and_restores(self):
+        original = bd.fast_dp_break
+        words = bd.split_words("Монгол хэл бол Монгол улсын албан ёсны хэл юм")
+        with bd.Instrumentation() as probe:
+            self.assertIsNot(bd.fast_dp_break, original)
+            bd.justify_words(words, 3, 1, 20)
+            bd.justify_words(words, 4, 4, 20, bd.MultiLangHyphenator(engine="native"))
+        self.assertIs(bd.fast_dp_break, original)
+        self.assertIsNone(bd.instrumentation)
+        stats = json.loads(probe.to_json())
+        self.assertEqual(stats["fast_dp_break"]["calls"], 1)
+        self.assertGreaterEqual(stats["fast_dp_break"]["dp_states"], len(words))
+        self.assertGreaterEqual(stats["dp_with_hyphenation"]["dp_states"], len(words))
+        self.assertEqual(stats["hyphenate"]["calls"], len(set(words)))
+        self.assertEqual(stats["format_by_type"]["calls"], 2)
+        prom = probe.to_prometheus()
+        self.assertIn('justify_stage_calls_total{stage="fast_dp_break"} 1', prom)
+        self.assertIn("# TYPE justify_stage_seconds_total counter", prom)
+
+
+    def test_cli_paths_record_tokenizing_and_window(self):
+        text = "Монгол хэл бол\nМонгол улсын албан ёсны хэл юм\n\nEnglish text wraps\n"
+        push = bd.WindowedBreaker.push
+        for window in (None, 4):
+            with bd.Instrumentation() as probe:
+                bd.justify_file(io.StringIO(text), io.StringIO(), 3, 1, 12, window=window)
+            stats = probe.snapshot()
+            self.assertEqual(stats["split_words"]["calls"], len(text.splitlines()))
+            if window:
+                self.assertEqual(stats["WindowedBreaker.push"]["calls"], len(text.split()))
+                self.assertEqual(stats["WindowedBreaker.finish"]["calls"], 2)
+                self.assertGreater(stats["WindowedBreaker.push"]["dp_states"], 0)
+            else:
+                self.assertNotIn("WindowedBreaker.push", stats)
+        self.assertIs(bd.WindowedBreaker.push, push)
+
+    def test_dp_states_count_inner_iterations(self):
+        words = ["ab"] * 30
+        states = {}
+        for width in (2, 5, 11):
+            with bd.Instrumentation() as probe:
+                bd.dp_break(words, width)
+            states[width] = probe.snapshot()["dp_break"]["dp_states"]
+        # мөрөнд 1, 2, 4 үг багтана: i бүрд багтах j-үүд + зогсоосон нэг шалгалт
+        self.assertEqual(states, {w: sum(min(k, 30 - i) for i in range(30)) for w, k in ((2, 2), (5, 3), (11, 5))})
+
+
+class TestProfiling(unittest.TestCase):
+    def test_layout_quality(self):
+        lines = ["aa bb  ", "cc-    ", "dd     ", "", "ee     "]
+        self.assertEqual(bd.layout_quality(lines, 7),
+                         {"lines": 4, "hyphens": 1, "raggedness": 2 ** 2 + 4 ** 2, "cost": 2 ** 3 + 4 ** 3})
+        self.assertEqual(bd.layout_quality(bd.full_justify([["a", "b"], ["c"]], 5), 5)["raggedness"], 4)
+
+    def test_profile_algorithms(self):
+        words = bd.split_words("Монгол хэл бол Монгол улсын албан ёсны хэл юм " * 4)
+        hyph = bd.MultiLangHyphenator(engine="native")
+        report, results = bd.profile_algorithms(words, 4, 20, hyph, trials=3, warmup=0)
+        self.assertEqual(list(report), [1, 2, 3, 4])
+        for algo, st in report.items():
+            self.assertEqual(results[algo], bd.justify_words(words, algo, 4, 20, hyph))
+            self.assertLessEqual(st["min_ms"], st["median_ms"])
+            self.assertLessEqual(st["median_ms"], st["p95_ms"])
+            self.assertGreater(st["peak_kb"], 0)
+            self.assertEqual(st["lines"], len(results[algo]))
+        isolated, lines = bd.profile_algorithms(words, 4, 20, algos=(3,), trials=1, memory=False, isolate=True)
+        self.assertEqual((lines[3], isolated[3]["peak_kb"]), (results[3], None))
+        saved = list(bd.report_lines(" ".join(words), 20, 4, 5, algorithms=bd.ALGORITHM_NAMES,
+                                     results=[results[a] for a in (1, 2, 3, 4)], times=[0.0] * 4, profile=report))
+        self.assertIn("raggedness", "\n".join(saved))
+
+
+class TestMappedText(unittest.TestCase):
+    def test_spans_match_str_tokenizer(self):
+        text = "  Монгол хэл\tбол  ‘quoted’ words\r\n \r\n\nSecond   paragraph ёс\n\n\n  last\n"
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "in.txt")
+            with open(path, "w", encoding="utf-8", newline="") as f:
+                f.write(text)
+            with bd.MappedText(path) as mapped:
+                self.assertEqual(len(mapped), len(text.strip()))
+                self.assertEqual([list(p) for p in mapped.paragraphs()], list(bd.iter_paragraphs(text.splitlines())))
+                words = mapped.span_words()
+                self.assertEqual(list(words), bd.split_words(text))
+                self.assertEqual(words[2:5], bd.split_words(text)[2:5])
+                self.assertEqual(words.metrics().prefix, bd.LineMetrics(bd.split_words(text)).prefix)
+                for algo in (1, 2, 3, 4):
+                    self.assertEqual(bd.justify_words(words, algo, 4, 12, self.hyph(), words.metrics()),
+                                     bd.justify_words(bd.split_words(text), algo, 4, 12, self.hyph()))
+            open(path, "w").close()
+            with bd.MappedText(path) as mapped:
+                self.assertEqual((len(mapped), list(mapped.paragraphs())), (0, []))
+
+    def test_layout_cache_hashes_mapped_bytes(self):
+        text = "Монгол хэл бол\nМонгол улс\n\nEnglish text\n\nМонгол хэл бол\nМонгол улс\n"
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "in.txt")
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(text)
+            with bd.MappedText(path) as mapped:
+                cache = bd.LayoutCache(8)
+                paragraphs = list(mapped.paragraphs())
+                with patch.object(mapped, "words", side_effect=AssertionError("decode")):
+                    keys = [cache.key(p, 3, 1, 10) for p in paragraphs]
+                self.assertEqual((keys[0] == keys[2], keys[0] == keys[1]), (True, False))
+                lines = [cache.justify(p, 3, 1, 10) for p in paragraphs]
+                self.assertEqual(lines, [bd.justify_words(list(p), 3, 1, 10) for p in paragraphs])
+                self.assertEqual(len(cache), 2)
+
+    def hyph(self):
+        return bd.HyphenTable(["Монгол", "paragraph"], [(3,), (4,)])
+
+
+class TestIncrementalLayout(unittest.TestCase):
+    def test_edits_match_full_rerun(self):
+        rnd = random.Random(4)
+        for algo, breaker in (("dp", bd.dp_break), ("greedy", bd.greedy_break)):
+            for _ in range(40):
+                width = rnd.randint(5, 40)
+                layout = bd.ParagraphLayout(["x" * rnd.randint(1, 9) for _ in range(rnd.randint(0, 80))],
+                                            width, algo)
+                for _ in range(20):
+                    n, r = len(layout.words), rnd.random()
+                    word = "y" * rnd.randint(1, 12)
+                    if r < 0.4 or n == 0:
+                        layout.insert(rnd.randint(0, n), word)
+                    elif r < 0.7:
+                        layout.delete(rnd.randrange(n))
+                    else:
+                        layout.replace(rnd.randrange(n), word)
+                    self.assertEqual(layout.lines(), breaker(layout.words, width))
+
+    def test_document_api(self):
+        text = "Монгол хэл бол Монгол улсын албан ёсны хэл юм\n\nEnglish text can also be wrapped"
+        layout = bd.IncrementalLayout(text, 20)
+        layout.replace_word(1, 0, "Latin")
+        layout.insert_word(0, 2, "бас")
+        layout.delete_paragraph(1)
+        layout.insert_paragraph(1, "шинэ догол мөр")
+        expected = ["Монгол хэл бас бол Монгол улсын албан ёсны хэл юм".split(), "шинэ догол мөр".split()]
+        self.assertEqual(layout.lines(), [bd.dp_break(words, 20) for words in expected])
+        first, second = layout.lines()
+        self.assertEqual(layout.format(4), bd.full_justify(first, 20) + [""] + bd.full_justify(second, 20))
+
+
+class TestBenchmark(unittest.TestCase):
+    def test_corpus_is_deterministic(self):
+        self.assertEqual(benchmark.make_corpus(50, "mn", seed=3), benchmark.make_corpus(50, "mn", seed=3))
+        self.assertNotEqual(benchmark.make_corpus(50, "en", seed=3), benchmark.make_corpus(50, "en", seed=4))
+
+    def test_run_suite_and_compare(self):
+        report = benchmark.run_suite(sizes=(200,), widths=(30,), langs=("mn",),
+                                     algorithms=("greedy_break", "fast_dp_break"), warmup=0, repeat=3)
+        self.assertEqual(len(report["results"]), 2)
+        row = report["results"][0]
+        self.assertLessEqual(row["min_ms"], row["median_ms"])
+        self.assertLessEqual(row["median_ms"], row["p95_ms"])
+        json.dumps(report)
+        slower = {"results": [dict(r, median_ms=r["median_ms"] * 2) for r in report["results"]]}
+        self.assertEqual(len(benchmark.compare_results(report, slower)), 2)
+        self.assertEqual(benchmark.compare_results(slower, report), [])
+
+    def test_cli_input_bench_runs(self):
+        out = io.StringIO()
+        with patch("sys.stdout", out):
+            benchmark.bench_cli_input(n_words=400, words_per_paragraph=50, algos=(1,), runs=1)
+        self.assertIn("stream", out.getvalue())
+        self.assertIn("mmap", out.getvalue())
+
+
+class TestServer(unittest.TestCase):
+    def test_requests_match_local_justify(self):
+        text = "Энэ бол жигдлэх текст юм.\n\nThis is a second paragraph with words."
+
+        async def scenario():
+            srv = await server.JustifyServer(port=0, batch_window_ms=5).start()
+            try:
+                payloads = [{"id": k, "text": text, "algo": 1 + k % 4, "type": 4, "width": 20} for k in range(8)]
+                payloads.append({"id": "bad", "text": text, "width": 0})
+                responses = await server.request(srv.host, srv.port, payloads)
+                stats = (await server.request(srv.host, srv.port, [{"cmd": "stats"}]))[0]["stats"]
+                return srv.hyph, responses, stats
+            finally:
+                await srv.close()
+
+        hyph, responses, stats = asyncio.run(scenario())
+        for k, resp in enumerate(responses[:-1]):
+            self.assertEqual(resp["id"], k)
+            self.assertEqual(resp["lines"], list(bd.iter_justified(text.splitlines(), 1 + k % 4, 4, 20, hyph)))
+        self.assertIn("error", responses[-1])
+        self.assertEqual((stats["requests"], stats["errors"]), (8, 1))
+        self.assertLess(stats["batches"], 8)
+
+
+    def test_parse_job_rejects_bad_width(self):
+        for width in (True, 0, -1, 2.5, server.MAX_WIDTH + 1):
+            with self.assertRaises(ValueError):
+                server.parse_job({"text": "a", "width": width})
+        self.assertEqual(server.parse_job({"text": "a", "width": server.MAX_WIDTH})[3], server.MAX_WIDTH)
+
+    def test_failing_job_does_not_fail_batch(self):
+        hyph = MagicMock()
+        hyph.hyphenate.side_effect = lambda w: 1 / 0 if w == "boom" else []
+
+        async def scenario():
+            srv = await server.JustifyServer(port=0, batch_window_ms=20).start()
+            srv.hyph = hyph
+            try:
+                payloads = [{"id": k, "text": "boom" if k == 1 else "aa bb cc", "algo": 4, "width": 5}
+                            for k in range(3)]
+                return await server.request(srv.host, srv.port, payloads), srv.batches
+            finally:
+                await srv.close()
+
+        responses, batches = asyncio.run(scenario())
+        self.assertEqual(batches, 1)
+        self.assertEqual([r.get("lines") for r in responses], [["aa bb", "cc   "], None, ["aa bb", "cc   "]])
+        self.assertIn("division", responses[1]["error"])
+
+    def test_close_cancels_running_batches(self):
+        import time
+        hyph = MagicMock()
+        hyph.hyphenate.side_effect = lambda w: time.sleep(0.2) or []
+
+        async def scenario():
+            srv = await server.JustifyServer(port=0, batch_window_ms=1).start()
+            srv.hyph = hyph
+            pending = [asyncio.ensure_future(srv.justify("aa bb", 4, 1, 5)) for _ in range(2)]
+            while not srv.running:
+                await asyncio.sleep(0.01)
+            await asyncio.wait_for(srv.close(), 5)
+            await asyncio.gather(*pending, return_exceptions=True)
+            return [t.cancelled() for t in pending], srv.running
+
+        self.assertEqual(asyncio.run(scenario()), ([True, True], set()))
+
+    def test_close_drops_idle_clients(self):
+        errors = []
+
+        async def scenario():
+            asyncio.get_running_loop().set_exception_handler(lambda loop, ctx: errors.append(ctx))
+            srv = await server.JustifyServer(port=0).start()
+            reader, writer = await asyncio.open_connection(srv.host, srv.port)
+            writer.write(b'{"id": 1, "text": "aa bb", "width": 5}\n')
+            await writer.drain()
+            await reader.readline()
+            await asyncio.wait_for(srv.close(), 5)
+            eof = await asyncio.wait_for(reader.read(), 5)
+            writer.close()
+            return eof, srv.clients
+
+        self.assertEqual(asyncio.run(scenario()), (b"", {}))
+        self.assertEqual(errors, [])
+
+
 class TestIntegration(unittest.TestCase):
     def test_full_pipeline_greedy_left(self):
         """